@@ -0,0 +1,73 @@
+"""Compare two benchmark result files and flag regressions.
+
+Works on the output of microbench.py and load_test.py. Metrics ending in _ms or _mb are
+lower-is-better, metrics ending in _rps are higher-is-better. Exits 1 if any shared
+metric regressed by more than the threshold. Run from src/backend:
+
+    python benchmarks/compare.py before.json after.json --threshold 10
+"""
+
+import argparse
+import json
+import sys
+
+LOWER_IS_BETTER = ("_ms", "_mb")
+HIGHER_IS_BETTER = ("_rps",)
+
+def change_percent(old: float, new: float, metric: str) -> float:
+    """Relative change in percent, positive meaning worse."""
+    if not old:
+        return 0.0
+    change = (new - old) / old * 100
+    return -change if metric.endswith(HIGHER_IS_BETTER) else change
+
+def compare(baseline: dict, candidate: dict, threshold: float, metrics: list = None) -> list:
+    rows = []
+    for name, old_values in baseline["results"].items():
+        new_values = candidate["results"].get(name)
+        if new_values is None:
+            continue
+        for metric, old in old_values.items():
+            if not metric.endswith(LOWER_IS_BETTER + HIGHER_IS_BETTER) or metric not in new_values:
+                continue
+            if metrics and metric not in metrics:
+                continue
+            new = new_values[metric]
+            worse = change_percent(old, new, metric)
+            rows.append({
+                "name": name, "metric": metric, "baseline": old, "candidate": new,
+                "change_percent": round(worse, 1), "regression": worse > threshold,
+            })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed slowdown in percent")
+    parser.add_argument("--metric", action="append", help="Only compare these metrics (repeatable), e.g. p50_ms")
+    parser.add_argument("--json", action="store_true", help="Print the comparison as JSON")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    rows = compare(baseline, candidate, args.threshold, args.metric)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        width = max((len(row["name"]) for row in rows), default=10)
+        for row in rows:
+            flag = "REGRESSION" if row["regression"] else ""
+            print(f"{row['name']:<{width}}  {row['metric']:<14} {row['baseline']:>12} -> {row['candidate']:<12} "
+                  f"{row['change_percent']:>+7.1f}%  {flag}")
+
+    regressions = sum(row["regression"] for row in rows)
+    if regressions:
+        print(f"{regressions} metric(s) regressed by more than {args.threshold:g}%", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
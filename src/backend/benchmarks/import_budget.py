@@ -0,0 +1,102 @@
+"""Import-time budget check and cold-start timings for the API.
+
+Imports the app in fresh interpreters and exits non-zero if the median import time
+exceeds the budget, listing the slowest modules (from -X importtime) to look at.
+With --startup it also starts a real server and times startup (including the
+warm-up scan) and the first and second measurement requests. Run from src/backend:
+
+    python benchmarks/import_budget.py --budget-ms 1500 --startup --output startup.json
+"""
+
+import argparse
+import base64
+import subprocess
+import sys
+import time
+
+import httpx
+
+from results import latency_summary, run_metadata, write_results
+from server import BACKEND_DIR, free_port, start_server
+from synthetic import make_jpeg
+
+def time_import(module: str) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=BACKEND_DIR, check=True, capture_output=True)
+    return (time.perf_counter() - started) * 1000
+
+def slowest_imports(module: str, count: int) -> list:
+    """Direct imports of module with the largest cumulative import time, from python -X importtime"""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, check=True, capture_output=True, text=True,
+    ).stderr
+    direct, pending = [], []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented two spaces per level; drop only the separator space before measuring that
+        name = name.rstrip().removeprefix(" ")
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        # Children are listed before their parent, so collect them until the parent shows up
+        if depth == 1:
+            pending.append((int(cumulative) / 1000, name))
+        elif depth == 0:
+            if name == module:
+                direct = pending
+            pending = []
+    # Only one level of each import chain, so one slow dependency is not counted twice
+    return [{"module": name, "cumulative_ms": round(ms, 1)} for ms, name in sorted(direct, reverse=True)[:count]]
+
+def time_startup() -> dict:
+    """Seconds from process start until the server answers, then first and second scan latency"""
+    port = free_port()
+    started = time.perf_counter()
+    server = start_server(port)
+    ready_ms = (time.perf_counter() - started) * 1000
+    data_url = "data:image/jpeg;base64," + base64.b64encode(make_jpeg(1)).decode()
+    payload = {"gender": "female", "height": "168", "measurementSystem": "metric", "frontImageBase64": data_url}
+    latencies = []
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+            for height in ("168", "169"):
+                # Different heights so the second request is not a cache hit
+                started = time.perf_counter()
+                client.post("/process-measurements", json=dict(payload, height=height)).raise_for_status()
+                latencies.append((time.perf_counter() - started) * 1000)
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "ready_ms": round(ready_ms, 1),
+        "first_request_ms": round(latencies[0], 1),
+        "second_request_ms": round(latencies[1], 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main", help="Module whose import is timed")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500, help="Maximum median import time")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to list")
+    parser.add_argument("--startup", action="store_true", help="Also time server startup and the first requests")
+    parser.add_argument("--output", help="Also save the results JSON to this file")
+    args = parser.parse_args()
+
+    samples = [time_import(args.module) for _ in range(args.repeat)]
+    results = {f"import[{args.module}]": dict(latency_summary(samples), slowest=slowest_imports(args.module, args.top))}
+    if args.startup:
+        results["startup"] = time_startup()
+
+    meta = run_metadata(benchmark="import_budget", module=args.module, budget_ms=args.budget_ms)
+    write_results(meta, results, args.output)
+
+    median = results[f"import[{args.module}]"]["p50_ms"]
+    if median > args.budget_ms:
+        print(f"Importing {args.module} took {median:.0f} ms, over the {args.budget_ms:.0f} ms budget", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""End-to-end load driver against the FastAPI app running in a real uvicorn process.
+
+For every resolution and side-image combination a fresh server is started, warmed up
+and then sent a fixed number of requests from a pool of concurrent clients. Reports
+p50/p95/p99 latency, throughput, rejections and the server's peak RSS. The result
+cache is disabled by default so repeated images are analyzed every time. Run from
+src/backend:
+
+    python benchmarks/load_test.py --megapixels 1 12 --requests 200 --concurrency 8 --output run.json
+"""
+
+import argparse
+import asyncio
+import base64
+import time
+
+import httpx
+
+from results import latency_summary, run_metadata, write_results
+from server import free_port, peak_rss_mb, start_server
+from synthetic import make_jpeg
+
+FIELDS = {"gender": "female", "height": "168", "measurementSystem": "metric"}
+
+def make_request(mode: str, image: bytes, with_side: bool) -> dict:
+    """Keyword arguments for client.post, built once and reused for every request."""
+    if mode == "json":
+        data_url = "data:image/jpeg;base64," + base64.b64encode(image).decode()
+        payload = dict(FIELDS, frontImageBase64=data_url)
+        if with_side:
+            payload["sideImageBase64"] = data_url
+        return {"url": "/process-measurements", "json": payload}
+
+    files = {"frontImage": ("front.jpg", image, "image/jpeg")}
+    if with_side:
+        files["sideImage"] = ("side.jpg", image, "image/jpeg")
+    return {"url": "/process-measurements/upload", "data": FIELDS, "files": files}
+
+async def drive(base_url: str, request: dict, requests: int, concurrency: int) -> dict:
+    latencies = []
+    statuses = {}
+    remaining = iter(range(requests))
+
+    async def client_loop(client: httpx.AsyncClient):
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                response = await client.post(**request)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == "200":
+                latencies.append(elapsed_ms)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        wall_s = time.perf_counter() - started
+
+    summary = latency_summary(latencies) if latencies else {"runs": 0}
+    summary.update(
+        throughput_rps=round(len(latencies) / wall_s, 3),
+        wall_s=round(wall_s, 3),
+        statuses=statuses,
+        errors=requests - len(latencies),
+    )
+    return summary
+
+def run_scenario(mode: str, megapixels: float, with_side: bool, args) -> dict:
+    image = make_jpeg(megapixels)
+    request = make_request(mode, image, with_side)
+    env = {"BODYFIT_CACHE_BACKEND": args.cache_backend}
+    if args.executor:
+        env["BODYFIT_EXECUTOR"] = args.executor
+    if args.workers:
+        env["BODYFIT_EXECUTOR_WORKERS"] = str(args.workers)
+
+    port = free_port()
+    server = start_server(port, env)
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        if args.warmup:
+            asyncio.run(drive(base_url, request, args.warmup, 1))
+        summary = asyncio.run(drive(base_url, request, args.requests, args.concurrency))
+        summary["peak_rss_mb"] = round(peak_rss_mb(server.pid), 1)
+    finally:
+        server.terminate()
+        server.wait()
+    summary["image_bytes"] = len(image)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[1, 12, 48])
+    parser.add_argument("--side", choices=("both", "yes", "no"), default="both",
+                        help="Run with a side image, without one, or both")
+    parser.add_argument("--mode", choices=("json", "upload"), default="upload")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--cache-backend", default="none", help="BODYFIT_CACHE_BACKEND for the server")
+    parser.add_argument("--executor", choices=("thread", "process"), help="BODYFIT_EXECUTOR for the server")
+    parser.add_argument("--workers", type=int, help="BODYFIT_EXECUTOR_WORKERS for the server")
+    parser.add_argument("--output", help="Also save the results JSON to this file")
+    args = parser.parse_args()
+
+    sides = {"both": (False, True), "yes": (True,), "no": (False,)}[args.side]
+    results = {}
+    for megapixels in args.megapixels:
+        for with_side in sides:
+            name = f"{args.mode}[{megapixels:g}mp,{'side' if with_side else 'front'}]"
+            results[name] = run_scenario(args.mode, megapixels, with_side, args)
+
+    meta = run_metadata(
+        benchmark="load_test", mode=args.mode, requests=args.requests, concurrency=args.concurrency,
+        cache_backend=args.cache_backend, executor=args.executor, workers=args.workers,
+    )
+    write_results(meta, results, args.output)
+
+if __name__ == "__main__":
+    main()
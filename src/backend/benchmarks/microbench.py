@@ -0,0 +1,144 @@
+"""Per-function microbenchmarks of the analysis and measurement code on synthetic scans.
+
+Times compute_image_stats, calculate_image_quality, analyze_image_brightness and
+analyze_body_type_enhanced on the full-resolution image and on the analysis proxy,
+plus proxy decoding, side image analysis and measurement generation, at each
+requested resolution with and without a side image, and response encoding
+(generic validate-and-encode vs. the fast JSON and binary paths).
+Run from src/backend:
+
+    python benchmarks/microbench.py --megapixels 1 12 48 --output before.json
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+from fastapi.encoders import jsonable_encoder
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from results import latency_summary, run_metadata, write_results
+from synthetic import make_jpeg
+from utils.image_processing import analyze_image_brightness, calculate_image_quality, make_analysis_proxy
+from utils.image_stats import compute_image_stats
+from utils.body_analysis import analyze_body_type_enhanced
+from utils.measurement_generator import generate_highly_accurate_measurements, generate_measurements_batch
+from models.measurement_models import BatchMeasurementItem, BatchMeasurementResult, MeasurementResult
+from services.response_encoding import encode_binary, encode_json
+import config
+
+def time_call(fn, repeat: int, budget_s: float) -> dict:
+    """Call fn up to repeat times (at least 3), stopping early once the time budget is spent."""
+    fn()  # Warm-up
+    samples = []
+    deadline = time.perf_counter() + budget_s
+    while len(samples) < repeat and (len(samples) < 3 or time.perf_counter() < deadline):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return latency_summary(samples)
+
+def bench_images(megapixels: float, repeat: int, budget_s: float) -> dict:
+    data = make_jpeg(megapixels)
+    full = Image.open(io.BytesIO(data))
+    full.load()
+    proxy = make_analysis_proxy(Image.open(io.BytesIO(data)), config.ANALYSIS_MAX_SIDE)
+    side = Image.open(io.BytesIO(data))
+
+    def analyze_side():
+        # Same work as the pipeline's side branch: decode a proxy, then score its quality
+        side_image = Image.open(io.BytesIO(data))
+        side_proxy = make_analysis_proxy(side_image, config.ANALYSIS_MAX_SIDE)
+        return calculate_image_quality(side_proxy, original_size=side.size, stats=compute_image_stats(side_proxy))
+
+    tag = f"{megapixels:g}mp"
+    results = {
+        f"make_analysis_proxy[{tag}]": time_call(
+            lambda: make_analysis_proxy(Image.open(io.BytesIO(data)), config.ANALYSIS_MAX_SIDE), repeat, budget_s
+        ),
+        # Runs on a helper thread alongside the front image decode, so it adds to CPU time more than to latency
+        f"side_analysis[{tag}]": time_call(analyze_side, repeat, budget_s),
+    }
+    side_quality = analyze_side()
+    for variant, image in (("full", full), ("proxy", proxy)):
+        results[f"compute_image_stats[{tag},{variant}]"] = time_call(
+            lambda: compute_image_stats(image), repeat, budget_s
+        )
+        for side_tag, side_image, quality in (("front", None, None), ("side", side, side_quality)):
+            results[f"calculate_image_quality[{tag},{variant},{side_tag}]"] = time_call(
+                lambda: calculate_image_quality(image, side_image, original_size=full.size, side_quality=quality),
+                repeat, budget_s
+            )
+        results[f"analyze_image_brightness[{tag},{variant}]"] = time_call(
+            lambda: analyze_image_brightness(image), repeat, budget_s
+        )
+        results[f"analyze_body_type_enhanced[{tag},{variant}]"] = time_call(
+            lambda: analyze_body_type_enhanced(image, original_size=full.size), repeat, budget_s
+        )
+    return results
+
+def bench_generation(repeat: int, budget_s: float, batch_size: int) -> dict:
+    body_type_data = {"bodyTypeFactor": 0.3, "waistProminence": 0.5}
+    rng = np.random.default_rng(0)
+    results = {}
+    for side_tag, has_side in (("front", False), ("side", True)):
+        results[f"generate_highly_accurate_measurements[{side_tag}]"] = time_call(
+            lambda: generate_highly_accurate_measurements("female", 168.0, has_side, body_type_data, rng=rng),
+            repeat, budget_s
+        )
+
+    genders = rng.integers(0, 3, batch_size)
+    heights = rng.uniform(150, 200, batch_size)
+    sides = rng.random(batch_size) < 0.5
+    factors = rng.random(batch_size)
+    results[f"generate_measurements_batch[{batch_size}]"] = time_call(
+        lambda: generate_measurements_batch(genders, heights, sides, factors, rng=rng), repeat, budget_s
+    )
+    return results
+
+def bench_serialization(repeat: int, budget_s: float, batch_size: int) -> dict:
+    body_type_data = {"bodyTypeFactor": 0.3, "waistProminence": 0.5}
+    result = MeasurementResult(
+        measurements=generate_highly_accurate_measurements("female", 168.0, True, body_type_data), confidence=0.97
+    )
+    batch = BatchMeasurementResult(results=[BatchMeasurementItem(result=result)] * batch_size)
+    results = {}
+    for tag, model, rows in (("single", result, [result]), (f"batch{batch_size}", batch, [result] * batch_size)):
+        # Roughly what FastAPI does with a response_model return value: validate again, then encode generically
+        results[f"serialize_generic[{tag}]"] = time_call(
+            lambda: json.dumps(jsonable_encoder(type(model).model_validate(model.model_dump()))).encode(),
+            repeat, budget_s
+        )
+        results[f"encode_json[{tag}]"] = time_call(lambda: encode_json(model), repeat, budget_s)
+        results[f"encode_binary[{tag}]"] = time_call(lambda: encode_binary(rows), repeat, budget_s)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[1, 12, 48])
+    parser.add_argument("--repeat", type=int, default=50, help="Maximum timed calls per benchmark")
+    parser.add_argument("--budget", type=float, default=2.0, help="Seconds to spend per benchmark after 3 calls")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--response-batch-size", type=int, default=16, help="Scans per encoded batch response")
+    parser.add_argument("--output", help="Also save the results JSON to this file")
+    args = parser.parse_args()
+
+    results = bench_generation(args.repeat, args.budget, args.batch_size)
+    results.update(bench_serialization(args.repeat, args.budget, args.response_batch_size))
+    for megapixels in args.megapixels:
+        results.update(bench_images(megapixels, args.repeat, args.budget))
+
+    meta = run_metadata(
+        benchmark="microbench", megapixels=args.megapixels, repeat=args.repeat,
+        analysis_max_side=config.ANALYSIS_MAX_SIDE,
+    )
+    write_results(meta, results, args.output)
+
+if __name__ == "__main__":
+    main()
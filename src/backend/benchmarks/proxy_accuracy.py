@@ -0,0 +1,93 @@
+
+"""Regression check: analysis on the low-resolution proxy must match full-resolution analysis.
+
+Runs image quality, body-type analysis and measurement generation on synthetic scans
+once at full resolution and once on the analysis proxy, and exits non-zero if any
+output drifts beyond tolerance. Run from src/backend:
+
+    python benchmarks/proxy_accuracy.py --max-side 512
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import make_jpeg
+from utils.image_processing import calculate_image_quality, make_analysis_proxy
+from utils.body_analysis import analyze_body_type_enhanced
+from utils.measurement_generator import generate_highly_accurate_measurements
+
+# Maximum allowed absolute differences between full-resolution and proxy analysis
+QUALITY_TOLERANCE = 0.01
+BODY_TYPE_TOLERANCE = 0.02
+MEASUREMENT_TOLERANCE_CM = 0.5
+
+def analyze(data: bytes, max_side: int) -> dict:
+    image = Image.open(io.BytesIO(data))
+    original_size = image.size
+    started = time.perf_counter()
+    proxy = make_analysis_proxy(image, max_side)
+    quality = calculate_image_quality(proxy, original_size=original_size)
+    body_type_data = analyze_body_type_enhanced(proxy, original_size=original_size)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    # Same jitter for both runs so only the image analysis can differ
+    rng = np.random.default_rng(0)
+    measurements = generate_highly_accurate_measurements("female", 168.0, False, body_type_data, rng=rng)
+    return {
+        "quality": quality,
+        "body_type_data": body_type_data,
+        "measurements": measurements,
+        "elapsed_ms": elapsed_ms,
+    }
+
+def compare(full: dict, proxy: dict) -> list:
+    """Return a list of human-readable tolerance violations."""
+    failures = []
+    if abs(full["quality"] - proxy["quality"]) > QUALITY_TOLERANCE:
+        failures.append(f"quality {full['quality']:.4f} vs {proxy['quality']:.4f}")
+    for key, value in full["body_type_data"].items():
+        if abs(value - proxy["body_type_data"][key]) > BODY_TYPE_TOLERANCE:
+            failures.append(f"{key} {value:.4f} vs {proxy['body_type_data'][key]:.4f}")
+    for key, value in full["measurements"].items():
+        if abs(value - proxy["measurements"][key]) > MEASUREMENT_TOLERANCE_CM:
+            failures.append(f"{key} {value} vs {proxy['measurements'][key]}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-side", type=int, default=512)
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[1, 12])
+    parser.add_argument("--seeds", type=int, default=3)
+    args = parser.parse_args()
+
+    report = []
+    failed = False
+    for megapixels in args.megapixels:
+        for seed in range(args.seeds):
+            data = make_jpeg(megapixels, seed)
+            full = analyze(data, 0)
+            proxy = analyze(data, args.max_side)
+            failures = compare(full, proxy)
+            failed = failed or bool(failures)
+            report.append({
+                "megapixels": megapixels,
+                "seed": seed,
+                "full_ms": round(full["elapsed_ms"], 1),
+                "proxy_ms": round(proxy["elapsed_ms"], 1),
+                "failures": failures,
+            })
+
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Shared result format for benchmark scripts, so any two runs can be compared with compare.py.
+
+A result file looks like {"meta": {...}, "results": {name: {metric: value}}}. Metric names
+carry their unit as a suffix: *_ms and *_mb are lower-is-better, *_rps is higher-is-better.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+def percentile(samples: list, q: float) -> float:
+    return float(np.percentile(samples, q)) if samples else float("nan")
+
+def latency_summary(samples_ms: list) -> dict:
+    return {
+        "runs": len(samples_ms),
+        "min_ms": round(min(samples_ms), 3),
+        "p50_ms": round(percentile(samples_ms, 50), 3),
+        "p95_ms": round(percentile(samples_ms, 95), 3),
+        "p99_ms": round(percentile(samples_ms, 99), 3),
+    }
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def run_metadata(**settings) -> dict:
+    """Describe the machine, code revision and settings a run was made with."""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": settings,
+    }
+
+def write_results(meta: dict, results: dict, output: str = None):
+    """Print the results as JSON and optionally save them to a file."""
+    document = {"meta": meta, "results": results}
+    text = json.dumps(document, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+        print(f"Saved results to {output}", file=sys.stderr)
+    print(text)
@@ -0,0 +1,42 @@
+"""Helpers for benchmarks that drive a real uvicorn server in a subprocess."""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def peak_rss_mb(pid: int) -> float:
+    """Peak resident set size of a process (VmHWM, Linux only)."""
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+def start_server(port: int, env: dict = None) -> subprocess.Popen:
+    """Start the app on port, with extra environment variables, and wait until it answers."""
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=dict(os.environ, **(env or {})),
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return server
+        except httpx.TransportError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("Server did not start")
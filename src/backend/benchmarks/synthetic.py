@@ -0,0 +1,46 @@
+
+"""Synthetic scan images for benchmarks, generated locally so no real photos are needed."""
+
+import io
+
+import numpy as np
+from PIL import Image
+
+# Rows generated at a time, so even 48 MP images only need float buffers for one block
+_BLOCK_ROWS = 512
+
+def megapixel_size(megapixels: float) -> tuple:
+    """Width and height of a 1:2 portrait image with roughly the given megapixels."""
+    width = max(2, int((megapixels * 1_000_000 / 2) ** 0.5))
+    return width, width * 2
+
+def make_image_array(megapixels: float, seed: int = 0) -> np.ndarray:
+    """Build a portrait RGB array of roughly the given resolution with a body-like silhouette."""
+    width, height = megapixel_size(megapixels)
+    rng = np.random.default_rng(seed)
+    figure_scale = 0.9 + 0.2 * rng.random()
+    figure_color = np.array([90, 70, 60], dtype=np.float32) * (0.8 + 0.4 * rng.random())
+    columns = np.abs(np.arange(width, dtype=np.float32) - width / 2)
+
+    pixels = np.empty((height, width, 3), dtype=np.uint8)
+    for start in range(0, height, _BLOCK_ROWS):
+        rows = np.arange(start, min(start + _BLOCK_ROWS, height), dtype=np.float32) / max(1, height - 1)
+
+        # Bright background with a vertical gradient
+        block = np.empty((len(rows), width, 3), dtype=np.float32)
+        block[:] = (200 - 50 * rows)[:, None, None]
+
+        # Darker figure whose width varies down the frame (shoulders, waist, hips)
+        half_width = width * (0.12 + 0.06 * np.cos(rows * 3 * np.pi) ** 2) * figure_scale
+        block[columns[None, :] < half_width[:, None]] = figure_color
+
+        # Sensor-like noise so the image compresses like a photo
+        block += rng.normal(0, 8, (len(rows), width, 1)).astype(np.float32)
+        pixels[start:start + len(rows)] = np.clip(block, 0, 255)
+    return pixels
+
+def make_jpeg(megapixels: float, seed: int = 0, quality: int = 90) -> bytes:
+    """Encode a synthetic scan as JPEG bytes."""
+    buffer = io.BytesIO()
+    Image.fromarray(make_image_array(megapixels, seed)).save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
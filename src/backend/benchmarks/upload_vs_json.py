@@ -0,0 +1,77 @@
+
+"""Compare peak server RSS and latency of the base64 JSON and multipart upload endpoints.
+
+Each mode gets a fresh uvicorn process so the peak RSS (VmHWM, Linux only) reflects
+that endpoint alone. Run from src/backend:
+
+    python benchmarks/upload_vs_json.py --megapixels 12 --requests 10
+"""
+
+import argparse
+import base64
+import json
+import statistics
+import time
+
+import httpx
+
+from server import free_port, peak_rss_mb, start_server
+from synthetic import make_jpeg
+
+def run_mode(mode: str, image: bytes, with_side: bool, requests: int) -> dict:
+    port = free_port()
+    # Every request sends the same image, so with caching on all but the first would be cache hits
+    server = start_server(port, {"BODYFIT_CACHE_BACKEND": "none"})
+    url = f"http://127.0.0.1:{port}/process-measurements"
+    fields = {"gender": "female", "height": "168", "measurementSystem": "metric"}
+    latencies = []
+    try:
+        with httpx.Client(timeout=120) as client:
+            for _ in range(requests):
+                if mode == "json":
+                    data_url = "data:image/jpeg;base64," + base64.b64encode(image).decode()
+                    payload = dict(fields, frontImageBase64=data_url)
+                    if with_side:
+                        payload["sideImageBase64"] = data_url
+                    started = time.perf_counter()
+                    response = client.post(url, json=payload)
+                else:
+                    files = {"frontImage": ("front.jpg", image, "image/jpeg")}
+                    if with_side:
+                        files["sideImage"] = ("side.jpg", image, "image/jpeg")
+                    started = time.perf_counter()
+                    response = client.post(url + "/upload", data=fields, files=files)
+                latencies.append((time.perf_counter() - started) * 1000)
+                response.raise_for_status()
+        rss = peak_rss_mb(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {
+        "mode": mode,
+        "requests": requests,
+        "latency_ms_mean": round(statistics.mean(latencies), 2),
+        "latency_ms_p50": round(statistics.median(latencies), 2),
+        "latency_ms_max": round(max(latencies), 2),
+        "server_peak_rss_mb": round(rss, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megapixels", type=float, default=12)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--no-side", action="store_true", help="Send only a front image")
+    args = parser.parse_args()
+
+    image = make_jpeg(args.megapixels)
+    results = {
+        "megapixels": args.megapixels,
+        "image_bytes": len(image),
+        "side_image": not args.no_side,
+        "modes": [run_mode(mode, image, not args.no_side, args.requests) for mode in ("json", "upload")],
+    }
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
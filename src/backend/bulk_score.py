@@ -0,0 +1,39 @@
+"""Re-score archived scans offline with the same pipeline as the API.
+
+    python bulk_score.py scans.jsonl -o results.jsonl
+    python bulk_score.py scans_dir/ -o results.csv --workers 8
+    python bulk_score.py scans.jsonl -o results.parquet --resume
+
+The input is a JSONL file of MeasurementRequest objects (an optional "id" field is
+copied to the output), or a directory of images with a manifest.jsonl / manifest.csv
+listing gender, height, measurementSystem, frontImage and optional id, sideImage and profile.
+"""
+
+import argparse
+import json
+import logging
+
+from services.bulk_scoring import WRITERS, score_archive
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="JSONL file of requests, or a directory of images with a manifest")
+    parser.add_argument("-o", "--output", required=True, help="Output file (or directory for parquet)")
+    parser.add_argument("--format", choices=sorted(WRITERS), help="Output format; guessed from the extension by default")
+    parser.add_argument("--manifest", help="Manifest file for a directory source; defaults to manifest.jsonl/.csv inside it")
+    parser.add_argument("--workers", type=int, help="Worker processes; defaults to the CPU count")
+    parser.add_argument("--chunksize", type=int, default=8, help="Records sent to a worker at a time")
+    parser.add_argument("--checkpoint-every", type=int, default=500, help="Records between output flushes and checkpoints")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint of an interrupted run")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    summary = score_archive(
+        args.source, args.output, fmt=args.format, manifest=args.manifest, workers=args.workers,
+        chunksize=args.chunksize, checkpoint_every=args.checkpoint_every, resume=args.resume,
+    )
+    print(json.dumps(summary))
+
+if __name__ == "__main__":
+    main()
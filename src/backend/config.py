@@ -0,0 +1,97 @@
+
+import os
+from dotenv import load_dotenv
+
+# Load settings from a local .env file if one is present
+load_dotenv()
+
+def _get_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment."""
+    value = os.getenv(name)
+    return int(value) if value else default
+
+def _get_bool(name: str, default: bool) -> bool:
+    """Read a boolean setting (1/true/yes) from the environment."""
+    value = os.getenv(name)
+    return value.lower() in ("1", "true", "yes") if value else default
+
+# Processing executor settings
+# "thread" keeps everything in one process, "process" sidesteps the GIL for CPU-bound stages
+EXECUTOR_KIND = os.getenv("BODYFIT_EXECUTOR", "thread").lower()
+EXECUTOR_WORKERS = _get_int("BODYFIT_EXECUTOR_WORKERS", min(4, os.cpu_count() or 1))
+# Number of requests allowed to wait for a free worker before new ones are rejected
+EXECUTOR_MAX_PENDING = _get_int("BODYFIT_EXECUTOR_MAX_PENDING", 16)
+# Seconds clients are told to wait before retrying a rejected request
+EXECUTOR_RETRY_AFTER = _get_int("BODYFIT_EXECUTOR_RETRY_AFTER", 1)
+
+# Request limits, checked before any image is decoded
+# Largest request body accepted by the measurement endpoints (a batch counts as one request)
+MAX_BODY_BYTES = _get_int("BODYFIT_MAX_BODY_BYTES", 50 * 1024 * 1024)
+# Largest image, in pixels, that will be decoded; guards against decompression bombs
+MAX_IMAGE_PIXELS = _get_int("BODYFIT_MAX_IMAGE_PIXELS", 64_000_000)
+
+# Anthropometric profiles: directory of <profile id>.json coefficient tables
+PROFILE_DIR = os.getenv("BODYFIT_PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+# Profile used by requests that do not select one
+DEFAULT_PROFILE = os.getenv("BODYFIT_DEFAULT_PROFILE", "default")
+# How often every process checks the profile files for changes; 0 only loads them once
+PROFILE_RELOAD_SECONDS = _get_int("BODYFIT_PROFILE_RELOAD_SECONDS", 2)
+
+# Run a tiny synthetic scan on every executor worker at startup, so the first requests after a
+# (re)start or scale-out do not pay for worker start-up, lazy imports and first-use initialization
+WARM_UP = _get_bool("BODYFIT_WARM_UP", True)
+
+# Debug capture of uploaded images; disabled when empty
+DEBUG_CAPTURE_DIR = os.getenv("BODYFIT_DEBUG_CAPTURE_DIR", "")
+
+# Longest side (in pixels) of the low-resolution proxy used for image analysis; 0 analyzes full resolution
+ANALYSIS_MAX_SIDE = _get_int("BODYFIT_ANALYSIS_MAX_SIDE", 512)
+
+# Tiered processing
+# Under overload (at least this many scans waiting for an executor worker) new scans are analyzed
+# in the "fast" tier, on a smaller proxy; 0 always uses the full tier
+FAST_TIER_QUEUE_DEPTH = _get_int("BODYFIT_FAST_TIER_QUEUE_DEPTH", max(1, EXECUTOR_MAX_PENDING // 2))
+# Longest side of the analysis proxy in the fast tier
+FAST_ANALYSIS_MAX_SIDE = _get_int("BODYFIT_FAST_ANALYSIS_MAX_SIDE", 128)
+# Front images with a shorter side below this are unusable
+MIN_IMAGE_SIDE = _get_int("BODYFIT_MIN_IMAGE_SIDE", 128)
+# What happens to unusable front images: "low_confidence" (measurements from height and gender only)
+# or "reject" (422)
+UNUSABLE_IMAGES = os.getenv("BODYFIT_UNUSABLE_IMAGES", "low_confidence").lower()
+
+# Batch processing
+# Largest number of scans accepted by /process-measurements/batch and coalesced into one micro-batch
+BATCH_MAX_SIZE = _get_int("BODYFIT_BATCH_MAX_SIZE", 16)
+# How long single requests wait for others to share a micro-batch; 0 disables coalescing
+BATCH_WAIT_MS = _get_int("BODYFIT_BATCH_WAIT_MS", 0)
+
+# Caching of image analysis and measurement results ("memory", "sqlite" or "none")
+CACHE_BACKEND = os.getenv("BODYFIT_CACHE_BACKEND", "memory").lower()
+CACHE_MAX_ENTRIES = _get_int("BODYFIT_CACHE_MAX_ENTRIES", 1024)
+CACHE_TTL_SECONDS = _get_int("BODYFIT_CACHE_TTL_SECONDS", 3600)
+# Database file used by the sqlite backend
+CACHE_PATH = os.getenv("BODYFIT_CACHE_PATH", "bodyfit_cache.sqlite3")
+
+# Asynchronous jobs (/jobs): store for job state and results ("memory" or "sqlite")
+JOB_STORE = os.getenv("BODYFIT_JOB_STORE", "memory").lower()
+# How long finished jobs can be fetched, and how many job records are kept at most
+JOB_TTL_SECONDS = _get_int("BODYFIT_JOB_TTL_SECONDS", 3600)
+JOB_MAX_ENTRIES = _get_int("BODYFIT_JOB_MAX_ENTRIES", 10000)
+# Database file used by the sqlite job store; share it between server processes
+JOB_STORE_PATH = os.getenv("BODYFIT_JOB_STORE_PATH", "bodyfit_jobs.sqlite3")
+# Jobs allowed to wait in the queue before submissions get 503
+JOB_QUEUE_SIZE = _get_int("BODYFIT_JOB_QUEUE_SIZE", 256)
+# Jobs processed at the same time; each one occupies an executor slot while it runs
+JOB_CONCURRENCY = _get_int("BODYFIT_JOB_CONCURRENCY", EXECUTOR_WORKERS)
+# How long a dequeued job waits for a free executor slot before it fails as busy
+JOB_BUSY_TIMEOUT_SECONDS = _get_int("BODYFIT_JOB_BUSY_TIMEOUT_SECONDS", 60)
+# Longest wait accepted by GET /jobs/{id}?wait=, and how often waits poll a store shared with other processes
+JOB_MAX_WAIT_SECONDS = _get_int("BODYFIT_JOB_MAX_WAIT_SECONDS", 30)
+JOB_POLL_SECONDS = 0.2
+
+# Deterministic mode: measurement jitter is seeded from the request content, so identical
+# requests get byte-identical responses (and ETags). BODYFIT_CACHE_DETERMINISTIC is the older name.
+DETERMINISTIC = _get_bool("BODYFIT_DETERMINISTIC", _get_bool("BODYFIT_CACHE_DETERMINISTIC", False))
+
+# Add a Server-Timing header with per-stage durations to measurement responses
+SERVER_TIMING = _get_bool("BODYFIT_SERVER_TIMING", False)
@@ -1,25 +1,172 @@
 
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers
 import uvicorn
-from pydantic import BaseModel
-from typing import Dict, Optional
+from pydantic import ValidationError
+from typing import Optional
+import hashlib
+import json
 import logging
+import time
 
 # Import from our modularized files
-from models.measurement_models import MeasurementRequest, MeasurementResult
-from utils.image_processing import calculate_image_quality, analyze_image_brightness
-from utils.body_analysis import analyze_body_type_enhanced
-from utils.measurement_generator import generate_highly_accurate_measurements
+from models.measurement_models import MeasurementRequest, MeasurementResult, BatchMeasurementRequest, BatchMeasurementItem, BatchMeasurementResult, ScanParameters
+from utils.image_validation import InvalidImageError, open_image, sniff_base64_image
+from utils.profiles import UnknownProfileError, get_registry
+from services.executor import ExecutorBusyError, get_executor, shutdown_executor
+from services.measurement_service import (
+    analyze_measurement_request, analyze_scan, process_measurement_request, process_measurement_upload,
+    process_scan_batch, warm_up,
+)
+from services.batching import get_batcher
+from services.cache import cache_stats
+from services.response_encoding import BINARY_MEDIA_TYPE, JSON_MEDIA_TYPE, accepts_binary, encode_binary, encode_json
+from services.jobs import FINISHED_STATES, JobQueueFullError, get_job_manager, shutdown_job_manager
+from services import metrics
+import config
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+BUSY_MESSAGE = "Server is busy processing other scans, please retry shortly"
+# Seconds between keep-alive comments on an idle job event stream
+JOB_EVENTS_HEARTBEAT = 15
+# Measurement endpoints can also answer in the compact binary format (see services/response_encoding.py)
+BINARY_RESPONSE = {200: {"content": {BINARY_MEDIA_TYPE: {}}}}
+
 # Initialize FastAPI app
 app = FastAPI(title="3DBodyFit API", description="API for 3D body measurements")
 
-# Add CORS middleware to allow frontend to connect
+@app.middleware("http")
+async def add_etag(request: Request, call_next):
+    """In deterministic mode, tag measurement responses so clients and HTTP caches can revalidate"""
+    response = await call_next(request)
+    if (not config.DETERMINISTIC or response.status_code != 200
+            or not request.url.path.startswith("/process-measurements")):
+        return response
+    
+    # Identical requests produce byte-identical bodies, so a body hash is a strong validator
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        headers = {"ETag": etag}
+        if "vary" in response.headers:
+            headers["Vary"] = response.headers["vary"]
+        return Response(status_code=304, headers=headers)
+    
+    headers = dict(response.headers)
+    headers["ETag"] = etag
+    return Response(content=body, status_code=response.status_code, headers=headers)
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header is * or lists the ETag, ignoring W/ prefixes (weak comparison)"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Record latency, in-flight and payload metrics for measurement requests"""
+    path = request.url.path
+    if not path.startswith("/process-measurements"):
+        return await call_next(request)
+    
+    started = time.perf_counter()
+    timings = metrics.start_request_timings()
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit():
+        metrics.payload_bytes.set(int(content_length))
+    
+    metrics.requests_in_flight.inc()
+    try:
+        response = await call_next(request)
+    finally:
+        metrics.requests_in_flight.dec()
+    
+    finished = time.perf_counter()
+    handler_done = timings.pop("_handler_done", None)
+    if handler_done is not None:
+        metrics.observe_stage("serialization", finished - handler_done)
+    metrics.request_duration.observe(finished - started, path, str(response.status_code))
+    
+    if config.SERVER_TIMING and timings:
+        response.headers["Server-Timing"] = metrics.server_timing_header(timings)
+    return response
+
+class BodySizeLimitMiddleware:
+    """Reject measurement and job requests whose body is larger than max_bytes with 413.
+
+    A declared Content-Length is checked before any of the body is read; bodies without
+    one (chunked uploads) are counted as they stream in and cut off once they pass the limit.
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["method"] != "POST"
+                or not scope["path"].startswith(("/process-measurements", "/jobs"))):
+            await self.app(scope, receive, send)
+            return
+        
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is not None and (not content_length.isdigit() or int(content_length) > self.max_bytes):
+            await self._too_large()(scope, receive, send)
+            return
+        
+        received = 0
+        response_started = False
+        rejected = False
+        
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request" and not response_started:
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Stop the app reading as if the client went away; its reply is replaced by the 413
+                    rejected = True
+                    return {"type": "http.disconnect"}
+            return message
+        
+        async def tracked_send(message):
+            nonlocal response_started
+            if rejected:
+                return
+            response_started = response_started or message["type"] == "http.response.start"
+            await send(message)
+        
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except Exception:
+            if not rejected:
+                raise
+        if rejected:
+            await self._too_large()(scope, receive, send)
+    
+    def _message(self) -> str:
+        return f"Request body is larger than the limit of {self.max_bytes} bytes"
+    
+    def _too_large(self) -> JSONResponse:
+        return JSONResponse(status_code=413, content={"detail": self._message()})
+
+app.add_middleware(BodySizeLimitMiddleware, max_bytes=config.MAX_BODY_BYTES)
+# Added last so it is the outermost layer and early error responses (e.g. 413) carry CORS headers too
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # In production, replace with specific origins
@@ -28,22 +175,264 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup():
+    if config.WARM_UP:
+        await warm_up()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await shutdown_job_manager()
+    shutdown_executor()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to 3DBodyFit API"}
 
-@app.post("/process-measurements", response_model=MeasurementResult)
-async def process_measurements(request: MeasurementRequest):
-    from services.measurement_service import process_measurement_request
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics: stage latency histograms, in-flight requests, payload and image sizes"""
+    return Response(content=metrics.render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Hit, miss and eviction counters of the analysis and result caches in this process"""
+    return cache_stats()
+
+@app.get("/profiles")
+async def list_profiles():
+    """Anthropometric profiles that requests can select with the profile field"""
+    registry = get_registry()
+    return {
+        "default": registry.default_profile,
+        "profiles": {
+            profile_id: {"version": profile.version, "description": profile.description}
+            for profile_id, profile in sorted(registry.profiles().items())
+        },
+    }
+
+@app.post("/profiles/reload")
+async def reload_profiles():
+    """Reload every profile file now, instead of waiting for the periodic change check"""
+    # Worker processes of a process executor pick the files up on their own periodic check
+    return {"profiles": get_registry().refresh(force=True)}
+
+@app.post("/process-measurements", response_model=MeasurementResult, responses=BINARY_RESPONSE)
+async def process_measurements(request: MeasurementRequest, http_request: Request):
+    logger.info(f"Processing measurement request for gender: {request.gender}")
+    # Reject non-images and decompression bombs from their headers before queueing any work
+    try:
+        _sniff_request_images(request)
+    except InvalidImageError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    # Coalesce with other requests arriving at the same time when micro-batching is enabled
+    batcher = get_batcher()
+    if batcher:
+        result = await _run_measurement(batcher.submit(analyze_measurement_request, request))
+    else:
+        result = await _run_measurement(process_measurement_request(request))
+    return _result_response(http_request, result)
+
+@app.post("/process-measurements/upload", response_model=MeasurementResult, responses=BINARY_RESPONSE)
+async def process_measurements_upload(
+    http_request: Request,
+    gender: str = Form(...),
+    height: str = Form(...),
+    measurementSystem: str = Form(...),
+    frontImage: UploadFile = File(...),
+    sideImage: Optional[UploadFile] = File(None),
+    profile: Optional[str] = Form(None),
+):
+    """Multipart variant of /process-measurements that takes the images as binary uploads"""
+    logger.info(f"Processing measurement upload for gender: {gender}")
+    scan = await _read_upload(gender, height, measurementSystem, frontImage, sideImage, profile)
+    
+    batcher = get_batcher()
+    if batcher:
+        gender, height, measurementSystem, front_bytes, side_bytes, profile = scan
+        result = await _run_measurement(
+            batcher.submit(analyze_scan, gender, height, measurementSystem, front_bytes, side_bytes, None, profile)
+        )
+    else:
+        result = await _run_measurement(process_measurement_upload(*scan))
+    return _result_response(http_request, result)
+
+@app.post("/process-measurements/batch", response_model=BatchMeasurementResult, responses=BINARY_RESPONSE)
+async def process_measurements_batch(request: BatchMeasurementRequest, http_request: Request):
+    """Process several scans at once; each scan succeeds or fails independently"""
+    scan_count = len(request.scans)
+    logger.info(f"Processing batch of {scan_count} measurement requests")
+    if scan_count > config.BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch contains {scan_count} scans, the maximum is {config.BATCH_MAX_SIZE}",
+        )
+    # Accept the whole batch or none of it, rather than failing part of it for load reasons
+    if not get_executor().has_capacity(scan_count):
+        raise _busy_error()
     
+    # Scans with unreadable images fail on their own without reaching a worker
+    results = [None] * scan_count
+    accepted = []
+    for i, scan in enumerate(request.scans):
+        try:
+            _sniff_request_images(scan)
+            accepted.append(i)
+        except InvalidImageError as e:
+            results[i] = e
+    processed = await process_scan_batch([(analyze_measurement_request, (request.scans[i],)) for i in accepted])
+    for i, result in zip(accepted, processed):
+        results[i] = result
+    
+    items = []
+    for result in results:
+        if isinstance(result, BaseException):
+            logger.warning(f"Error processing batch scan: {str(result)}")
+            items.append(BatchMeasurementItem(error=_error_message(result)))
+        else:
+            items.append(BatchMeasurementItem(result=result))
+    metrics.mark_handler_done()
+    if accepts_binary(http_request.headers.get("accept", "")):
+        return _binary_response([item.result or item.error for item in items])
+    return _json_response(BatchMeasurementResult(results=items))
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: MeasurementRequest, response: Response):
+    """Queue a measurement request and return its job id immediately; see GET /jobs/{id}"""
+    try:
+        _sniff_request_images(request)
+    except InvalidImageError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return _submit_job(response, lambda: process_measurement_request(request))
+
+@app.post("/jobs/upload", status_code=202)
+async def submit_upload_job(
+    response: Response,
+    gender: str = Form(...),
+    height: str = Form(...),
+    measurementSystem: str = Form(...),
+    frontImage: UploadFile = File(...),
+    sideImage: Optional[UploadFile] = File(None),
+    profile: Optional[str] = Form(None),
+):
+    """Multipart variant of POST /jobs"""
+    scan = await _read_upload(gender, height, measurementSystem, frontImage, sideImage, profile)
+    return _submit_job(response, lambda: process_measurement_upload(*scan))
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    """Job status, plus the result or error once finished. With ?wait=N, wait up to N seconds for it to finish"""
+    manager = get_job_manager()
+    wait = min(max(wait, 0), config.JOB_MAX_WAIT_SECONDS)
+    job = await manager.wait(job_id, wait) if wait else manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found or expired")
+    return job
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Server-sent events with the job record on every status change, closed once the job finishes"""
+    manager = get_job_manager()
+    job = manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found or expired")
+    
+    async def events():
+        current = job
+        while True:
+            status = current["status"]
+            yield f"event: {status}\ndata: {json.dumps(current)}\n\n"
+            if status in FINISHED_STATES:
+                return
+            while True:
+                current = await manager.wait(job_id, JOB_EVENTS_HEARTBEAT, since=status)
+                if current is None or current["status"] != status:
+                    break
+                # Comment lines keep proxies from closing an idle stream while the job waits in the queue
+                yield ": keep-alive\n\n"
+            if current is None:
+                yield "event: expired\ndata: {}\n\n"
+                return
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+def _submit_job(response: Response, job_factory) -> dict:
     try:
-        logger.info(f"Processing measurement request for gender: {request.gender}")
-        result = await process_measurement_request(request)
+        job = get_job_manager().submit(job_factory)
+    except JobQueueFullError as e:
+        logger.warning(f"Rejecting job: {str(e)}")
+        raise _busy_error()
+    response.headers["Location"] = f"/jobs/{job['id']}"
+    return job
+
+async def _read_upload(gender, height, measurement_system, front_image, side_image, profile) -> tuple:
+    """Validate the fields and image headers of a multipart scan and read the images"""
+    try:
+        fields = ScanParameters(gender=gender, height=height, measurementSystem=measurement_system, profile=profile)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    
+    # Read the spooled uploads once; the bytes are handed to the pipeline without further copies
+    front_bytes = await front_image.read()
+    side_bytes = await side_image.read() if side_image else None
+    try:
+        # Header-only checks, the images are decoded on a worker
+        open_image(front_bytes, "front image")
+        if side_bytes:
+            open_image(side_bytes, "side image")
+    except InvalidImageError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return fields.gender, fields.height, fields.measurementSystem, front_bytes, side_bytes, fields.profile
+
+async def _run_measurement(job):
+    """Await a measurement job and translate failures into HTTP errors"""
+    try:
+        result = await job
+        metrics.mark_handler_done()
         return result
     
+    except ExecutorBusyError as e:
+        logger.warning(f"Rejecting measurement request: {str(e)}")
+        raise _busy_error()
+    except (InvalidImageError, UnknownProfileError) as e:
+        logger.warning(f"Rejecting invalid request: {str(e)}")
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         logger.error(f"Error processing measurements: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing measurements: {str(e)}")
+        raise HTTPException(status_code=500, detail=_error_message(e))
+
+def _result_response(http_request: Request, result: MeasurementResult) -> Response:
+    """Encode a measurement result as JSON, or in the binary format when the client accepts it"""
+    if accepts_binary(http_request.headers.get("accept", "")):
+        return _binary_response([result])
+    return _json_response(result)
+
+def _json_response(model) -> Response:
+    # The result is already validated; returning a Response skips FastAPI's second validation pass
+    return Response(content=encode_json(model), media_type=JSON_MEDIA_TYPE, headers={"Vary": "Accept"})
+
+def _binary_response(results: list) -> Response:
+    return Response(content=encode_binary(results), media_type=BINARY_MEDIA_TYPE, headers={"Vary": "Accept"})
+
+def _busy_error() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=BUSY_MESSAGE,
+        headers={"Retry-After": str(config.EXECUTOR_RETRY_AFTER)},
+    )
+
+def _sniff_request_images(request: MeasurementRequest):
+    sniff_base64_image(request.frontImageBase64, "front image")
+    if request.sideImageBase64:
+        sniff_base64_image(request.sideImageBase64, "side image")
+
+def _error_message(error: BaseException) -> str:
+    if isinstance(error, ExecutorBusyError):
+        return BUSY_MESSAGE
+    if isinstance(error, (InvalidImageError, UnknownProfileError)):
+        return str(error)
+    return f"Error processing measurements: {str(error)}"
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -1,19 +1,99 @@
 
-from pydantic import BaseModel
-from typing import Dict, Optional, List
+import math
+from utils.profiles import get_profile
+from pydantic import BaseModel, field_validator, model_validator
+from typing import Optional, List
 
-class MeasurementRequest(BaseModel):
+GENDERS = ("male", "female", "other")
+MEASUREMENT_SYSTEMS = ("metric", "imperial")
+# Plausible body heights; anything outside is a unit mix-up or a broken client
+MIN_HEIGHT_CM = 50.0
+MAX_HEIGHT_CM = 272.0
+
+class ScanParameters(BaseModel):
+    """Non-image fields of a scan, validated before any image work starts"""
     gender: str
     height: str
     measurementSystem: str
+    # Anthropometric profile (see /profiles); the default profile when omitted
+    profile: Optional[str] = None
+
+    @field_validator("gender", "measurementSystem")
+    @classmethod
+    def normalize_choice(cls, value: str, info):
+        value = value.strip().lower()
+        choices = GENDERS if info.field_name == "gender" else MEASUREMENT_SYSTEMS
+        if value not in choices:
+            raise ValueError(f"must be one of {', '.join(choices)}")
+        return value
+
+    @field_validator("height")
+    @classmethod
+    def check_height_number(cls, value: str):
+        try:
+            height = float(value)
+        except ValueError:
+            raise ValueError("must be a number")
+        if not math.isfinite(height) or height <= 0:
+            raise ValueError("must be a positive number")
+        return value.strip()
+
+    @field_validator("profile")
+    @classmethod
+    def check_profile(cls, value: Optional[str]):
+        if value is not None:
+            # Raises UnknownProfileError, a ValueError, listing the available profiles
+            get_profile(value)
+        return value
+
+    @model_validator(mode="after")
+    def check_height_range(self):
+        height_cm = float(self.height) * (2.54 if self.measurementSystem == "imperial" else 1)
+        if not MIN_HEIGHT_CM <= height_cm <= MAX_HEIGHT_CM:
+            unit = "in" if self.measurementSystem == "imperial" else "cm"
+            raise ValueError(f"height {self.height} {unit} is outside the supported range "
+                             f"of {MIN_HEIGHT_CM:g}-{MAX_HEIGHT_CM:g} cm")
+        return self
+
+class MeasurementRequest(ScanParameters):
     frontImageBase64: str
     sideImageBase64: Optional[str] = None
 
+class Measurements(BaseModel):
+    """Body measurements in cm (estimatedBMI in kg/m²), in the order of MEASUREMENT_KEYS"""
+    chest: float
+    waist: float
+    hips: float
+    inseam: float
+    shoulder: float
+    sleeve: float
+    neck: float
+    thigh: float
+    height: float
+    upperArm: float
+    forearm: float
+    calf: float
+    estimatedBMI: float
+
 class MeasurementResult(BaseModel):
-    measurements: Dict[str, float]
+    measurements: Measurements
     confidence: float
+    # Processing tier: "full", "fast" (smaller analysis proxy, used under overload) or
+    # "minimal" (unusable image, measurements from height and gender only)
+    tier: str = "full"
 
 class BodyTypeData(BaseModel):
     bodyTypeFactor: float
     waistProminence: float
     widthToHeightRatio: float
+
+class BatchMeasurementRequest(BaseModel):
+    scans: List[MeasurementRequest]
+
+class BatchMeasurementItem(BaseModel):
+    # Exactly one of result/error is set, in the same order as the submitted scans
+    result: Optional[MeasurementResult] = None
+    error: Optional[str] = None
+
+class BatchMeasurementResult(BaseModel):
+    results: List[BatchMeasurementItem]
@@ -1,4 +1,26 @@
-
 #!/bin/bash
+# Usage: ./run.sh [dev|prod]
+#   dev  (default) single process with auto-reload on code changes
+#   prod several server processes, no reload; each one warms up its executor before serving
+MODE=${1:-dev}
+PORT=${PORT:-8000}
+
+if [ "$MODE" = "prod" ]; then
+    # One server process per core; each handles one scan at a time unless told otherwise
+    WORKERS=${BODYFIT_SERVER_WORKERS:-$(nproc)}
+    export BODYFIT_EXECUTOR_WORKERS=${BODYFIT_EXECUTOR_WORKERS:-1}
+    if [ "$WORKERS" -gt 1 ]; then
+        # Any process may be asked about a job another one accepted, so state must be shared
+        export BODYFIT_JOB_STORE=${BODYFIT_JOB_STORE:-sqlite}
+        export BODYFIT_CACHE_BACKEND=${BODYFIT_CACHE_BACKEND:-sqlite}
+        if [ "${BODYFIT_JOB_STORE,,}" = "memory" ]; then
+            echo "BODYFIT_JOB_STORE=memory only works with one server process; set BODYFIT_SERVER_WORKERS=1 or use sqlite" >&2
+            exit 1
+        fi
+    fi
+    echo "Starting 3DBodyFit Backend API (production, $WORKERS workers)..."
+    exec python -m uvicorn main:app --host 0.0.0.0 --port "$PORT" --workers "$WORKERS" --no-server-header
+fi
+
 echo "Starting 3DBodyFit Backend API..."
-python -m uvicorn main:app --host 0.0.0.0 --port 8000 --reload
+python -m uvicorn main:app --host 0.0.0.0 --port "$PORT" --reload
@@ -0,0 +1,74 @@
+
+import asyncio
+import logging
+
+import config
+from services import metrics
+from services.measurement_service import process_scan_batch
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """Coalesces single scans that arrive within a short window into one batch.
+
+    Scans are decoded in parallel on the processing executor and their measurements
+    are generated with one vectorized call. Every caller gets back its own result,
+    or its own exception if only that scan failed.
+    """
+
+    def __init__(self, max_batch_size: int = 16, max_wait_ms: int = 5):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending = []
+        self._flush_handle = None
+        # Keep references to running batches so they are not garbage collected
+        self._tasks = set()
+
+    async def submit(self, fn, *args):
+        """Queue one analysis job (see process_scan_batch) and wait for its MeasurementResult."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # The batch runs in its own task; stage timings are recorded back onto the caller's request
+        self._pending.append(((fn, args), metrics.current_request_timings(), future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._process(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, batch):
+        try:
+            results = await process_scan_batch([job for job, _, _ in batch], [timings for _, timings, _ in batch])
+        except Exception as e:
+            logger.error(f"Error processing micro-batch: {str(e)}")
+            results = [e] * len(batch)
+
+        for (_, _, future), result in zip(batch, results):
+            # The caller may have gone away while the batch was running
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+_batcher = None
+
+def get_batcher():
+    """Return the shared micro-batcher, or None when coalescing is disabled."""
+    global _batcher
+    if _batcher is None and config.BATCH_WAIT_MS > 0:
+        _batcher = MicroBatcher(config.BATCH_MAX_SIZE, config.BATCH_WAIT_MS)
+    return _batcher
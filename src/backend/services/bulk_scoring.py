@@ -0,0 +1,253 @@
+
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+import threading
+
+from models.measurement_models import MeasurementRequest, ScanParameters
+from services.measurement_service import run_measurement_pipeline, run_image_pipeline
+from utils.measurement_generator import MEASUREMENT_KEYS
+
+logger = logging.getLogger(__name__)
+
+RESULT_COLUMNS = ["id", "error", "confidence", *MEASUREMENT_KEYS]
+MANIFEST_NAMES = ("manifest.jsonl", "manifest.csv")
+
+# Input records: (index, kind, payload) tuples that are cheap to pickle, the worker
+# does the parsing and image reading so the parent only ever holds raw lines
+
+def read_jsonl_records(path: str, skip: int = 0):
+    """Yield one record per non-blank line of a JSONL file of MeasurementRequest objects"""
+    index = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            if index >= skip:
+                yield index, "jsonl", line
+            index += 1
+
+def find_manifest(directory: str) -> str:
+    for name in MANIFEST_NAMES:
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"No {' or '.join(MANIFEST_NAMES)} found in {directory}")
+
+def read_manifest_records(directory: str, manifest: str = None, skip: int = 0):
+    """Yield one record per manifest row of a directory of images.
+
+    Rows have gender, height, measurementSystem, frontImage and optionally id,
+    sideImage and profile, with image paths relative to the directory.
+    """
+    manifest = manifest or find_manifest(directory)
+    with open(manifest, encoding="utf-8", newline="") as f:
+        if manifest.endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for index, row in enumerate(rows):
+            if index >= skip:
+                yield index, "image", (directory, row)
+
+def score_record(record) -> dict:
+    """Run the measurement pipeline for one input record, executed on a pool worker"""
+    index, kind, payload = record
+    record_id = index
+    try:
+        if kind == "jsonl":
+            data = json.loads(payload)
+            record_id = data.get("id", index)
+            result = run_measurement_pipeline(MeasurementRequest(**data))
+        else:
+            directory, row = payload
+            record_id = row.get("id") or index
+            fields = ScanParameters(
+                gender=row["gender"], height=str(row["height"]),
+                measurementSystem=row.get("measurementSystem") or "metric", profile=row.get("profile") or None,
+            )
+            result = run_image_pipeline(
+                fields.gender, fields.height, fields.measurementSystem,
+                _read_file(directory, row["frontImage"]),
+                _read_file(directory, row["sideImage"]) if row.get("sideImage") else None,
+                fields.profile,
+            )
+    except Exception as e:
+        return {"id": record_id, "error": f"{type(e).__name__}: {e}"}
+    return {"id": record_id, "confidence": result.confidence, "measurements": result.measurements.model_dump()}
+
+def _read_file(directory: str, name: str) -> bytes:
+    with open(os.path.join(directory, name), "rb") as f:
+        return f.read()
+
+def flatten_result(result: dict) -> dict:
+    """One flat row per result for the columnar writers"""
+    row = {"id": str(result["id"]), "error": result.get("error"), "confidence": result.get("confidence")}
+    measurements = result.get("measurements") or {}
+    for key in MEASUREMENT_KEYS:
+        row[key] = measurements.get(key)
+    return row
+
+class JSONLWriter:
+    """Appends one JSON object per result; resumable by truncating to the checkpointed offset"""
+
+    def __init__(self, path: str, offset: int = None):
+        self.path = path
+        self._file = open(path, "r+b" if offset is not None else "wb")
+        if offset is not None:
+            self._file.truncate(offset)
+            self._file.seek(offset)
+
+    def write(self, result: dict):
+        self._file.write(json.dumps(result).encode() + b"\n")
+
+    def flush(self) -> int:
+        """Flush to disk and return the offset to resume from"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+class CSVWriter(JSONLWriter):
+    """Flattened measurement columns, one row per result"""
+
+    def __init__(self, path: str, offset: int = None):
+        super().__init__(path, offset)
+        if offset is None:
+            self._file.write(",".join(RESULT_COLUMNS).encode() + b"\r\n")
+
+    def write(self, result: dict):
+        row = flatten_result(result)
+        self._file.write(_csv_line([row[column] for column in RESULT_COLUMNS]))
+
+def _csv_line(values: list) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(["" if value is None else value for value in values])
+    return buffer.getvalue().encode()
+
+class ParquetWriter:
+    """Columnar output as a directory of Parquet part files, one per checkpoint interval.
+
+    Needs pyarrow, which is an optional dependency.
+    """
+
+    def __init__(self, path: str, offset: int = None):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)") from e
+        self._pyarrow = pyarrow
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        # The offset is the number of complete part files; later ones are from an interrupted run
+        self._part = offset or 0
+        for name in os.listdir(path):
+            if name.startswith("part-") and int(name[5:10]) >= self._part:
+                os.remove(os.path.join(path, name))
+        self._rows = []
+
+    def write(self, result: dict):
+        self._rows.append(flatten_result(result))
+
+    def flush(self) -> int:
+        if self._rows:
+            table = self._pyarrow.Table.from_pylist(self._rows, schema=self._schema())
+            self._pyarrow.parquet.write_table(table, os.path.join(self.path, f"part-{self._part:05d}.parquet"))
+            self._part += 1
+            self._rows = []
+        return self._part
+
+    def _schema(self):
+        pa = self._pyarrow
+        fields = [("id", pa.string()), ("error", pa.string()), ("confidence", pa.float64())]
+        return pa.schema(fields + [(key, pa.float64()) for key in MEASUREMENT_KEYS])
+
+    def close(self):
+        self.flush()
+
+WRITERS = {"jsonl": JSONLWriter, "csv": CSVWriter, "parquet": ParquetWriter}
+
+def output_format(path: str) -> str:
+    """Guess the output format from the file extension"""
+    extension = os.path.splitext(path.rstrip("/"))[1].lower().lstrip(".")
+    return extension if extension in WRITERS else "jsonl"
+
+def load_checkpoint(path: str) -> dict:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def save_checkpoint(path: str, checkpoint: dict):
+    """Write the checkpoint atomically so an interruption never leaves a torn file"""
+    temporary = path + ".tmp"
+    with open(temporary, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(temporary, path)
+
+def bounded(records, limit: threading.BoundedSemaphore):
+    """Pause the pool's task feeder once limit records are in flight.
+
+    Pool.imap otherwise reads the whole input ahead of the workers, so memory would
+    grow with the archive size.
+    """
+    for record in records:
+        limit.acquire()
+        yield record
+
+def score_archive(source: str, output: str, fmt: str = None, manifest: str = None, workers: int = None,
+                  chunksize: int = 8, checkpoint_every: int = 500, resume: bool = False) -> dict:
+    """Score every scan of a JSONL archive or an image directory, writing results as they complete.
+
+    Results are written in input order. Every checkpoint_every records the output is
+    flushed and a checkpoint saved next to it, so with resume=True an interrupted run
+    continues after the last checkpointed record.
+    """
+    fmt = fmt or output_format(output)
+    workers = workers or os.cpu_count() or 1
+    checkpoint_path = output.rstrip("/") + ".checkpoint"
+
+    checkpoint = load_checkpoint(checkpoint_path) if resume else None
+    if checkpoint and (checkpoint["source"] != os.path.abspath(source) or checkpoint["format"] != fmt):
+        raise ValueError(f"Checkpoint {checkpoint_path} belongs to a different source or format")
+    done = checkpoint["completed"] if checkpoint else 0
+    failed = checkpoint["failed"] if checkpoint else 0
+    if done:
+        logger.info(f"Resuming after {done} records")
+
+    if os.path.isdir(source):
+        records = read_manifest_records(source, manifest, skip=done)
+    else:
+        records = read_jsonl_records(source, skip=done)
+
+    writer = WRITERS[fmt](output, checkpoint["offset"] if checkpoint else None)
+    # A few chunks per worker keeps every worker busy without reading far ahead
+    limit = threading.BoundedSemaphore(workers * chunksize * 4)
+    try:
+        with multiprocessing.Pool(workers) as pool:
+            for result in pool.imap(score_record, bounded(records, limit), chunksize):
+                limit.release()
+                writer.write(result)
+                done += 1
+                failed += "error" in result
+                if done % checkpoint_every == 0:
+                    _checkpoint(writer, checkpoint_path, source, fmt, done, failed)
+                    logger.info(f"Scored {done} records ({failed} failed)")
+        _checkpoint(writer, checkpoint_path, source, fmt, done, failed)
+    finally:
+        writer.close()
+
+    logger.info(f"Finished: {done} records scored, {failed} failed")
+    return {"completed": done, "failed": failed, "output": output, "format": fmt}
+
+def _checkpoint(writer, path: str, source: str, fmt: str, done: int, failed: int):
+    offset = writer.flush()
+    save_checkpoint(path, {
+        "source": os.path.abspath(source), "format": fmt, "completed": done, "failed": failed, "offset": offset,
+    })
@@ -0,0 +1,176 @@
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import config
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+class CacheStats:
+    """Hit, miss and eviction counters for one cache."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def as_dict(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+class MemoryCache:
+    """In-process LRU cache with a per-entry time to live.
+
+    Safe to share between worker threads. With a process executor every worker
+    process has its own copy, use SQLiteCache to share entries between them.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """Return the cached value for key, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.stats.evictions += 1
+                self.stats.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+class SQLiteCache:
+    """On-disk LRU cache with a time to live, shared by every process using the same file.
+
+    Values must be JSON serializable. Counters are per process.
+    """
+
+    def __init__(self, path: str, table: str, max_entries: int = 1024, ttl_seconds: float = 3600):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        # sqlite3 connections cannot be shared between threads
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str):
+        """Return the cached value for key, or None if it is missing or expired."""
+        now = time.time()
+        with self._connection() as connection:
+            row = connection.execute(f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+
+            value, expires_at = row
+            if expires_at < now:
+                connection.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self.stats.evictions += 1
+                self.stats.misses += 1
+                return None
+
+            connection.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+        self.stats.hits += 1
+        return json.loads(value)
+
+    def set(self, key: str, value):
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + self.ttl_seconds, now),
+            )
+            # Drop expired entries first, then the least recently used ones beyond the size limit
+            evicted = connection.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (now,)).rowcount
+            evicted += connection.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+        self.stats.evictions += evicted
+
+    def __len__(self):
+        return self._connection().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def _make_cache(name: str):
+    if config.CACHE_BACKEND == "memory":
+        return MemoryCache(config.CACHE_MAX_ENTRIES, config.CACHE_TTL_SECONDS)
+    if config.CACHE_BACKEND == "sqlite":
+        return SQLiteCache(config.CACHE_PATH, name, config.CACHE_MAX_ENTRIES, config.CACHE_TTL_SECONDS)
+    if config.CACHE_BACKEND == "none":
+        return None
+    raise ValueError(f"Unknown cache backend: {config.CACHE_BACKEND}")
+
+def get_cache(name: str):
+    """Return the named cache ("analysis" or "results"), or None when caching is disabled."""
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = _make_cache(name)
+            if _caches[name] is not None:
+                logger.info(f"Using {config.CACHE_BACKEND} backend for the {name} cache")
+        return _caches[name]
+
+def cache_stats() -> dict:
+    """Counters and sizes of every cache created in this process."""
+    return {
+        name: dict(cache.stats.as_dict(), entries=len(cache))
+        for name, cache in _caches.items() if cache is not None
+    }
+
+class _CacheMetrics:
+    """Exposes the cache counters on /metrics."""
+
+    def render(self) -> list:
+        stats = cache_stats()
+        lines = []
+        for counter in ("hits", "misses", "evictions"):
+            name = f"bodyfit_cache_{counter}_total"
+            lines += [f"# HELP {name} Cache {counter} in this process", f"# TYPE {name} counter"]
+            lines += [f'{name}{{cache="{cache}"}} {values[counter]}' for cache, values in stats.items()]
+        return lines
+
+metrics.register(_CacheMetrics())
@@ -0,0 +1,42 @@
+
+import os
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Single background writer so captures never block the measurement pipeline
+_writer = None
+
+def capture_enabled() -> bool:
+    """Check whether debug capture of uploaded images is switched on."""
+    return bool(config.DEBUG_CAPTURE_DIR)
+
+def capture_images(images: dict):
+    """Queue the raw uploaded image bytes for writing under the capture directory.
+
+    images maps a label (e.g. "front") to a (bytes, format) tuple. Each call gets
+    its own capture id, so concurrent requests never overwrite each other.
+    """
+    global _writer
+    if _writer is None:
+        _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bodyfit-capture")
+
+    capture_id = uuid.uuid4().hex
+    _writer.submit(_write_images, capture_id, images)
+    return capture_id
+
+def _write_images(capture_id: str, images: dict):
+    try:
+        os.makedirs(config.DEBUG_CAPTURE_DIR, exist_ok=True)
+        for label, (data, image_format) in images.items():
+            extension = (image_format or "bin").lower()
+            path = os.path.join(config.DEBUG_CAPTURE_DIR, f"{capture_id}_{label}.{extension}")
+            with open(path, "wb") as f:
+                f.write(data)
+        logger.info(f"Captured debug images for {capture_id}")
+    except Exception as e:
+        logger.warning(f"Error writing debug capture {capture_id}: {str(e)}")
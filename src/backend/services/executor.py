@@ -0,0 +1,115 @@
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import config
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+class ExecutorBusyError(Exception):
+    """Raised when the processing queue is full and no more work can be accepted."""
+
+class BoundedExecutor:
+    """Runs CPU-bound work off the event loop with a bounded number of in-flight jobs."""
+
+    def __init__(self, kind: str = "thread", max_workers: int = 4, max_pending: int = 16):
+        if kind == "process":
+            self._pool = ProcessPoolExecutor(max_workers=max_workers)
+        elif kind == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bodyfit-worker")
+        else:
+            raise ValueError(f"Unknown executor kind: {kind}")
+
+        self.kind = kind
+        self.max_workers = max_workers
+        # Jobs running on a worker plus jobs waiting for one
+        self.capacity = max_workers + max_pending
+        self.in_flight = 0
+
+    def has_capacity(self, jobs: int = 1) -> bool:
+        """Check whether this many more jobs would currently be accepted."""
+        return self.in_flight + jobs <= self.capacity
+
+    def queued(self) -> int:
+        """Jobs accepted but still waiting for a free worker."""
+        return max(0, self.in_flight - self.max_workers)
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on the pool, rejecting immediately if the queue is full."""
+        if not self.has_capacity():
+            raise ExecutorBusyError(f"Processing queue is full ({self.capacity} jobs in flight)")
+
+        loop = asyncio.get_running_loop()
+        future = self._pool.submit(metrics.run_collected, fn, *args)
+        self.in_flight += 1
+        # Release the slot when the job actually finishes, even if the caller stopped waiting
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+        result, work = await asyncio.wrap_future(future)
+        # Stage timings recorded on the worker are replayed into the metrics here
+        metrics.record_work(work)
+        return result
+
+    async def warm_up(self, fn):
+        """Run fn once per worker so every worker is started and initialized before real traffic.
+
+        Stage timings of the warm-up runs are discarded rather than recorded in the metrics.
+        """
+        futures = [self._pool.submit(metrics.run_collected, fn) for _ in range(self.max_workers)]
+        await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+
+    def _release(self):
+        self.in_flight -= 1
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+_executor = None
+
+metrics.register(metrics.Gauge(
+    "bodyfit_executor_jobs_in_flight", "Jobs running or queued on the processing executor",
+    callback=lambda: _executor.in_flight if _executor else 0,
+))
+metrics.register(metrics.Gauge(
+    "bodyfit_executor_capacity", "Maximum jobs accepted by the processing executor",
+    callback=lambda: _executor.capacity if _executor else 0,
+))
+
+def get_executor() -> BoundedExecutor:
+    """Return the shared processing executor, creating it on first use."""
+    global _executor
+    if _executor is None:
+        _executor = BoundedExecutor(
+            kind=config.EXECUTOR_KIND,
+            max_workers=config.EXECUTOR_WORKERS,
+            max_pending=config.EXECUTOR_MAX_PENDING,
+        )
+        logger.info(f"Started {_executor.kind} executor with {_executor.max_workers} workers")
+    return _executor
+
+_branch_pool = None
+_branch_pool_pid = None
+
+def get_branch_pool() -> ThreadPoolExecutor:
+    """Return this process's thread pool for running independent branches of one job concurrently.
+
+    Created on first use in every process, so process executor workers never inherit
+    a pool from their parent.
+    """
+    global _branch_pool, _branch_pool_pid
+    if _branch_pool is None or _branch_pool_pid != os.getpid():
+        _branch_pool = ThreadPoolExecutor(max_workers=config.EXECUTOR_WORKERS, thread_name_prefix="bodyfit-branch")
+        _branch_pool_pid = os.getpid()
+    return _branch_pool
+
+def shutdown_executor():
+    """Stop the shared executor and branch pool if they were started."""
+    global _executor, _branch_pool
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
+    if _branch_pool is not None:
+        _branch_pool.shutdown(wait=False)
+        _branch_pool = None
@@ -0,0 +1,184 @@
+
+import asyncio
+import logging
+import time
+import uuid
+
+import config
+from services import metrics
+from services.cache import MemoryCache, SQLiteCache
+from services.executor import ExecutorBusyError, get_executor
+from utils.image_validation import InvalidImageError
+from utils.profiles import UnknownProfileError
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+FINISHED_STATES = (SUCCEEDED, FAILED)
+# Back-off while a dequeued job waits for the processing executor, doubled up to the maximum
+BUSY_RETRY_SECONDS = 0.05
+BUSY_RETRY_MAX_SECONDS = 1.0
+
+class JobQueueFullError(Exception):
+    """Raised when the job queue cannot take another job."""
+
+def _make_store():
+    """Job records live in a TTL store; the cache backends already provide exactly that."""
+    if config.JOB_STORE == "memory":
+        return MemoryCache(config.JOB_MAX_ENTRIES, config.JOB_TTL_SECONDS)
+    if config.JOB_STORE == "sqlite":
+        return SQLiteCache(config.JOB_STORE_PATH, "jobs", config.JOB_MAX_ENTRIES, config.JOB_TTL_SECONDS)
+    raise ValueError(f"Unknown job store: {config.JOB_STORE}")
+
+class JobManager:
+    """Accepts measurement jobs, runs them from a bounded queue and keeps their state in a store.
+
+    A fixed number of dispatcher tasks take jobs off the queue and run them on the
+    processing executor, so a burst of submissions is smoothed out instead of being
+    rejected. Job records (status, result or error) are kept for the store's TTL.
+    With the sqlite store every server process can answer for every job.
+    """
+
+    def __init__(self, store, queue_size: int = 256, concurrency: int = 4):
+        self.store = store
+        self.concurrency = concurrency
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._dispatchers = []
+        # Wakes up long-polls and event streams of jobs owned by this process
+        self._changed = {}
+
+    def submit(self, job_factory) -> dict:
+        """Queue job_factory (returns an awaitable MeasurementResult) and return the new job record."""
+        if self._queue.full():
+            raise JobQueueFullError(f"Job queue is full ({self._queue.maxsize} jobs waiting)")
+        self._start_dispatchers()
+
+        job_id = uuid.uuid4().hex
+        job = self._save({"id": job_id, "status": QUEUED, "createdAt": time.time()})
+        self._changed[job_id] = asyncio.Event()
+        self._queue.put_nowait((job_id, job_factory))
+        return job
+
+    def get(self, job_id: str) -> dict:
+        """Return the job record, or None if it is unknown or expired."""
+        return self.store.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float, since: str = None) -> dict:
+        """Return the job once its status differs from since (default: once it has finished) or on timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in FINISHED_STATES or (since and job["status"] != since):
+                return job
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return job
+
+            event = self._changed.get(job_id)
+            try:
+                if event is not None:
+                    await asyncio.wait_for(event.wait(), remaining)
+                else:
+                    # Job owned by another process: all we can do is poll the shared store
+                    await asyncio.sleep(min(remaining, config.JOB_POLL_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    def _start_dispatchers(self):
+        if not self._dispatchers:
+            self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.concurrency)]
+            logger.info(f"Started {self.concurrency} job dispatchers")
+
+    async def _dispatch(self):
+        while True:
+            job_id, job_factory = await self._queue.get()
+            try:
+                await self._run(job_id, job_factory)
+            except Exception as e:
+                logger.error(f"Unexpected error running job {job_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str, job_factory):
+        job = self.get(job_id)
+        if job is None:
+            return
+        # Synchronous requests may be using every executor slot; the job stays queued until one frees up
+        executor = get_executor()
+        deadline = time.monotonic() + config.JOB_BUSY_TIMEOUT_SECONDS
+        delay = BUSY_RETRY_SECONDS
+        while not executor.has_capacity():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(f"Job {job_id} gave up after waiting {config.JOB_BUSY_TIMEOUT_SECONDS} s for the executor")
+                self._update(job, status=FAILED, error=self._busy_message(), errorType="busy")
+                return
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, BUSY_RETRY_MAX_SECONDS)
+
+        # No await between the capacity check and the executor submission at the start of job_factory
+        self._update(job, status=RUNNING, startedAt=time.time())
+        try:
+            result = await job_factory()
+        except ExecutorBusyError:
+            self._update(job, status=FAILED, error=self._busy_message(), errorType="busy")
+        except (InvalidImageError, UnknownProfileError) as e:
+            self._update(job, status=FAILED, error=str(e), errorType="invalid_request")
+        except Exception as e:
+            logger.error(f"Error processing job {job_id}: {str(e)}")
+            self._update(job, status=FAILED, error=f"Error processing measurements: {str(e)}")
+        else:
+            self._update(job, status=SUCCEEDED, result=result.model_dump())
+
+    @staticmethod
+    def _busy_message() -> str:
+        return f"Server stayed busy for {config.JOB_BUSY_TIMEOUT_SECONDS} s, please resubmit the job"
+
+    def _update(self, job: dict, **changes):
+        job.update(changes)
+        if job["status"] in FINISHED_STATES:
+            job["finishedAt"] = time.time()
+        self._save(job)
+        event = self._changed.get(job["id"])
+        if event is not None:
+            event.set()
+            if job["status"] in FINISHED_STATES:
+                del self._changed[job["id"]]
+            else:
+                # Fresh event for the next change; current waiters have already been woken
+                self._changed[job["id"]] = asyncio.Event()
+
+    def _save(self, job: dict) -> dict:
+        job["updatedAt"] = time.time()
+        self.store.set(job["id"], dict(job))
+        return job
+
+    async def shutdown(self):
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        self._dispatchers = []
+
+_manager = None
+
+metrics.register(metrics.Gauge(
+    "bodyfit_jobs_queued", "Asynchronous jobs waiting for a dispatcher",
+    callback=lambda: _manager.queued() if _manager else 0,
+))
+
+def get_job_manager() -> JobManager:
+    """Return the shared job manager, creating it on first use."""
+    global _manager
+    if _manager is None:
+        _manager = JobManager(_make_store(), config.JOB_QUEUE_SIZE, config.JOB_CONCURRENCY)
+        logger.info(f"Using {config.JOB_STORE} job store")
+    return _manager
+
+async def shutdown_job_manager():
+    global _manager
+    if _manager is not None:
+        await _manager.shutdown()
+        _manager = None
@@ -1,59 +1,392 @@
 
+import asyncio
 import base64
+import binascii
+import hashlib
 import io
-import os
 import logging
+import time
+from dataclasses import dataclass
 from PIL import Image
+import numpy as np
 
 # Import from our utility modules
-from utils.image_processing import calculate_image_quality
-from utils.body_analysis import analyze_body_type_enhanced
-from utils.measurement_generator import generate_highly_accurate_measurements
+from utils.image_processing import calculate_image_quality, find_metadata_issue, find_thumbnail_issue, make_analysis_proxy
+from utils.image_stats import compute_image_stats
+from utils.image_validation import InvalidImageError, UnusableImageError, open_image
+from utils.body_analysis import NEUTRAL_BODY_TYPE, analyze_body_type_enhanced
+from utils.measurement_generator import generate_highly_accurate_measurements, generate_measurements_batch, gender_code, seeded_rng, MEASUREMENT_KEYS
+from utils.profiles import get_profile
 from models.measurement_models import MeasurementRequest, MeasurementResult
+from services.executor import get_branch_pool, get_executor
+from services.debug_capture import capture_enabled, capture_images
+from services.cache import get_cache
+from services import metrics
+from services.metrics import stage_timer, record_image_pixels, record_stage
+import config
 
 logger = logging.getLogger(__name__)
 
+TIER_FULL, TIER_FAST, TIER_MINIMAL = "full", "fast", "minimal"
+# Confidence reported for measurements of unusable images, which come from height and gender only
+UNUSABLE_IMAGE_CONFIDENCE = 0.3
+
+@dataclass
+class ScanAnalysis:
+    """Everything the measurement stage needs from one decoded scan"""
+    gender: str
+    height_cm: float
+    has_side_image: bool
+    confidence: float
+    body_type_data: dict
+    image_digest: str
+    profile_id: str
+    profile_tag: str
+    tier: str = TIER_FULL
+
+    def result_key(self) -> str:
+        return result_cache_key(
+            self.image_digest, self.gender, self.height_cm, self.has_side_image, self.profile_tag, self.tier
+        )
+
+def select_tier() -> str:
+    """Processing tier for a new scan: fast when scans are piling up in front of the executor"""
+    # Deterministic responses (and their ETags) must not depend on load
+    if config.DETERMINISTIC:
+        return TIER_FULL
+    if config.FAST_TIER_QUEUE_DEPTH and get_executor().queued() >= config.FAST_TIER_QUEUE_DEPTH:
+        logger.debug("Executor is overloaded, using the fast tier")
+        return TIER_FAST
+    return TIER_FULL
+
 async def process_measurement_request(request: MeasurementRequest):
     """Process measurement request and generate results based on provided images"""
-    # Convert base64 images to PIL Images
-    front_image = Image.open(io.BytesIO(base64.b64decode(request.frontImageBase64.split(',')[1])))
-    
-    side_image = None
-    if request.sideImageBase64:
-        side_image = Image.open(io.BytesIO(base64.b64decode(request.sideImageBase64.split(',')[1])))
-    
-    # Save images temporarily (optional)
-    front_image.save("temp_front.jpg")
-    if side_image:
-        side_image.save("temp_side.jpg")
-    
+    # Decoding and analysis are CPU-bound, so keep them off the event loop
+    return await get_executor().run(run_measurement_pipeline, request, select_tier())
+
+async def process_measurement_upload(gender: str, height: str, measurement_system: str,
+                                     front_bytes: bytes, side_bytes: bytes = None, profile: str = None):
+    """Process a measurement request whose images were uploaded as raw bytes"""
+    return await get_executor().run(
+        run_image_pipeline, gender, height, measurement_system, front_bytes, side_bytes, profile, select_tier()
+    )
+
+async def process_scan_batch(jobs: list, timings: list = None):
+    """Analyze many scans in parallel and generate their measurements in one vectorized call.
+
+    jobs is a list of (analysis function, args) tuples, normally analyze_measurement_request
+    or analyze_scan, whose last parameter is the processing tier. Returns one entry per
+    job, in order: a MeasurementResult, or the exception that job failed with, so one
+    bad scan never fails the rest. timings optionally holds the request timings of every
+    job's caller, when the batch runs on their behalf (see MicroBatcher).
+    """
+    executor = get_executor()
+    # One tier for the whole batch, decided by the load before it was queued
+    tier = select_tier()
+
+    async def analyze(job_timings, fn, args):
+        # gather runs every job in its own task, so this only redirects that job's stages
+        with metrics.request_timings(job_timings):
+            return await executor.run(fn, *args, tier)
+
+    job_timings = timings or [metrics.current_request_timings()] * len(jobs)
+    analyses = await asyncio.gather(
+        *(analyze(owner, fn, args) for (fn, args), owner in zip(jobs, job_timings)), return_exceptions=True
+    )
+    succeeded = [analysis for analysis in analyses if isinstance(analysis, ScanAnalysis)]
+    if timings is None:
+        results = iter(build_measurement_results(succeeded)) if succeeded else iter(())
+    else:
+        # The shared generation step is observed once and counted in every caller's timings
+        with metrics.request_timings({}) as shared:
+            results = iter(build_measurement_results(succeeded)) if succeeded else iter(())
+        for analysis, owner in zip(analyses, timings):
+            if isinstance(analysis, ScanAnalysis):
+                metrics.add_timings(owner, shared)
+    return [next(results) if isinstance(analysis, ScanAnalysis) else analysis for analysis in analyses]
+
+async def warm_up():
+    """Start every executor worker and run a tiny scan on each, so the first real requests pay no start-up cost"""
+    executor = get_executor()
+    started = time.perf_counter()
+    await executor.warm_up(warm_up_worker)
+    logger.info(f"Warmed up {executor.max_workers} workers in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+def warm_up_worker():
+    """Exercise every pipeline stage once: PIL decoders, numpy kernels, profiles, caches and helper threads"""
+    buffer = io.BytesIO()
+    # A gradient, so the image passes the pre-pass and reaches every analysis stage
+    Image.linear_gradient("L").resize((128, 256)).convert("RGB").save(buffer, "JPEG")
+    image_bytes = buffer.getvalue()
+
+    _, body_type_data = _analyze_images(image_bytes, image_bytes)
+    profile = get_profile()
+    generate_highly_accurate_measurements("female", 168.0, True, body_type_data, rng=seeded_rng("warm-up"), profile=profile)
+    generate_measurements_batch([gender_code("male")], [175.0], [False], [0.0], rng=seeded_rng("warm-up"), profile=profile)
+    get_cache("analysis")
+    get_cache("results")
+
+def run_measurement_pipeline(request: MeasurementRequest, tier: str = TIER_FULL):
+    """Synchronous pipeline for base64 JSON requests, executed on a worker thread or process"""
+    front_bytes = decode_base64_image(request.frontImageBase64)
+    side_bytes = decode_base64_image(request.sideImageBase64) if request.sideImageBase64 else None
+    return run_image_pipeline(
+        request.gender, request.height, request.measurementSystem, front_bytes, side_bytes, request.profile, tier
+    )
+
+def run_image_pipeline(gender: str, height: str, measurement_system: str,
+                       front_bytes: bytes, side_bytes: bytes = None, profile: str = None, tier: str = TIER_FULL):
+    """Synchronous measurement pipeline over raw image bytes"""
+    # Repeated scans (client retries, unit system changes) skip the whole pipeline
+    digest = image_digest(front_bytes, side_bytes)
+    key = result_cache_key(
+        digest, gender, height_to_cm(height, measurement_system), bool(side_bytes), get_profile(profile).tag, tier
+    )
+    cached = _get_cached_result(key)
+    if cached:
+        return cached
+
+    analysis = analyze_scan(
+        gender, height, measurement_system, front_bytes, side_bytes, digest=digest, profile=profile, tier=tier
+    )
+    return _generate_result(analysis)
+
+def analyze_measurement_request(request: MeasurementRequest, tier: str = TIER_FULL) -> ScanAnalysis:
+    """Decode and analyze the base64 images of a JSON measurement request"""
+    front_bytes = decode_base64_image(request.frontImageBase64)
+    side_bytes = decode_base64_image(request.sideImageBase64) if request.sideImageBase64 else None
+    return analyze_scan(
+        request.gender, request.height, request.measurementSystem, front_bytes, side_bytes,
+        profile=request.profile, tier=tier
+    )
+
+def analyze_scan(gender: str, height: str, measurement_system: str, front_bytes: bytes, side_bytes: bytes = None,
+                 digest: str = None, profile: str = None, tier: str = TIER_FULL) -> ScanAnalysis:
+    """Decode and analyze one scan, everything up to measurement generation.
+
+    Clearly unusable front images end the analysis early; they are rejected with
+    UnusableImageError or measured from height and gender only (the minimal tier),
+    depending on config.UNUSABLE_IMAGES.
+    """
+    # Resolve the profile first, so an unknown one fails before any image work
+    profile_tables = get_profile(profile)
     # Convert height to cm for consistency
-    height_cm = float(request.height)
-    if request.measurementSystem == "imperial":
-        height_cm = height_cm * 2.54  # Convert inches to cm
-        
-    # Calculate confidence based on image quality and availability
-    image_quality = calculate_image_quality(front_image, side_image)
-    confidence = min(0.98, 0.88 + image_quality * 0.15)  # Increased base confidence
-    
+    height_cm = height_to_cm(height, measurement_system)
+    has_side_image = bool(side_bytes)
+
+    # Image analysis only depends on the image bytes, so it is shared across genders, heights and units
+    if digest is None:
+        digest = image_digest(front_bytes, side_bytes)
+    analysis_key = f"{digest}:{int(has_side_image)}" + (f":{tier}" if tier != TIER_FULL else "")
+    analysis_cache = get_cache("analysis")
+    analyzed = analysis_cache.get(analysis_key) if analysis_cache is not None else None
+    if not analyzed:
+        try:
+            image_quality, body_type_data = _analyze_images(front_bytes, side_bytes, tier)
+            analyzed = {"tier": tier, "imageQuality": image_quality, "bodyTypeData": body_type_data}
+        except UnusableImageError as e:
+            # Remembered like any other analysis, so a retried upload is not decoded again
+            analyzed = {"tier": TIER_MINIMAL, "reason": str(e)}
+        if analysis_cache is not None:
+            analysis_cache.set(analysis_key, analyzed)
+
+    tier = analyzed.get("tier", tier)
+    if tier == TIER_MINIMAL:
+        if config.UNUSABLE_IMAGES == "reject":
+            raise UnusableImageError(analyzed["reason"])
+        logger.info(f"Measuring from height and gender only: {analyzed['reason']}")
+        confidence = UNUSABLE_IMAGE_CONFIDENCE
+        body_type_data = NEUTRAL_BODY_TYPE
+    else:
+        # Calculate confidence based on image quality and availability
+        confidence = min(0.98, 0.88 + analyzed["imageQuality"] * 0.15)  # Increased base confidence
+        body_type_data = analyzed["bodyTypeData"]
+
+    return ScanAnalysis(
+        gender=gender,
+        height_cm=height_cm,
+        has_side_image=has_side_image,
+        confidence=confidence,
+        body_type_data=body_type_data,
+        image_digest=digest,
+        profile_id=profile_tables.profile_id,
+        profile_tag=profile_tables.tag,
+        tier=tier,
+    )
+
+def _analyze_images(front_bytes: bytes, side_bytes: bytes = None, tier: str = TIER_FULL):
+    """Decode the images and return (image quality, body type data).
+
+    Raises UnusableImageError from the pre-pass: the front image's header, then its
+    analysis proxy, before the side image result and the full analysis are awaited.
+    """
+    max_side = config.FAST_ANALYSIS_MAX_SIDE if tier == TIER_FAST else config.ANALYSIS_MAX_SIDE
+    # Decode images straight from memory, nothing is written to disk
+    with stage_timer("image_open"):
+        # Only the headers are read here; unsupported or oversized images are rejected before decoding
+        front_image = open_image(front_bytes, "front image")
+        front_size = front_image.size
+        front_format = front_image.format
+
+        side_image = None
+        if side_bytes:
+            side_image = open_image(side_bytes, "side image")
+    record_image_pixels(front_size[0] * front_size[1])
+
+    if capture_enabled():
+        images = {"front": (front_bytes, front_format)}
+        if side_image:
+            images["side"] = (side_bytes, side_image.format)
+        capture_images(images)
+
+    issue = find_metadata_issue(front_size, config.MIN_IMAGE_SIDE)
+    if issue:
+        raise UnusableImageError(f"The front {issue}")
+
+    # The side branch is independent of the front one, so it runs on a helper thread
+    # while this thread decodes the front image (PIL releases the GIL while decoding)
+    side_future = get_branch_pool().submit(_analyze_side_image, side_image, max_side) if side_image else None
+
+    with stage_timer("image_decode"):
+        # All analyzers share one low-resolution proxy of the front image
+        front_proxy = _decode_proxy(front_image, "front image", max_side)
+        # One pass over the proxy pixels feeds both quality and body-type analysis
+        front_stats = compute_image_stats(front_proxy)
+
+    issue = find_thumbnail_issue(front_stats)
+    if issue:
+        if side_future:
+            side_future.cancel()
+        raise UnusableImageError(f"The front {issue}")
+
+    side_quality = None
+    if side_future:
+        side_quality, side_seconds = side_future.result()
+        record_stage("side_analysis", side_seconds)
+
+    with stage_timer("quality"):
+        image_quality = calculate_image_quality(
+            front_proxy, side_image, original_size=front_size, stats=front_stats, side_quality=side_quality
+        )
+
     # Analyze body type from front image (enhanced version)
-    body_type_data = analyze_body_type_enhanced(front_image)
-    
+    with stage_timer("body_analysis"):
+        body_type_data = analyze_body_type_enhanced(front_proxy, original_size=front_size, stats=front_stats)
+    return image_quality, body_type_data
+
+def _analyze_side_image(side_image, max_side: int):
+    """Side branch: quality score of the side image and the time it took"""
+    started = time.perf_counter()
+    side_size = side_image.size
+    side_proxy = _decode_proxy(side_image, "side image", max_side)
+    side_quality = calculate_image_quality(side_proxy, original_size=side_size, stats=compute_image_stats(side_proxy))
+    return side_quality, time.perf_counter() - started
+
+def _decode_proxy(image, label: str, max_side: int):
+    try:
+        return make_analysis_proxy(image, max_side)
+    except OSError as e:
+        raise InvalidImageError(f"The {label} is truncated or corrupt: {e}") from e
+
+def build_measurement_result(analysis: ScanAnalysis) -> MeasurementResult:
+    """Generate the measurements for one analyzed scan"""
+    return _get_cached_result(analysis.result_key()) or _generate_result(analysis)
+
+def _generate_result(analysis: ScanAnalysis) -> MeasurementResult:
+    key = analysis.result_key()
     # Generate improved measurements with enhanced accuracy
-    measurements = generate_highly_accurate_measurements(
-        request.gender, 
-        height_cm, 
-        side_image is not None, 
-        body_type_data
-    )
-    
-    # Clean up temporary files
-    if os.path.exists("temp_front.jpg"):
-        os.remove("temp_front.jpg")
-    if os.path.exists("temp_side.jpg") and side_image:
-        os.remove("temp_side.jpg")
-        
-    return MeasurementResult(
+    with stage_timer("measurement_generation"):
+        measurements = generate_highly_accurate_measurements(
+            analysis.gender,
+            analysis.height_cm,
+            analysis.has_side_image,
+            analysis.body_type_data,
+            rng=_result_rng(key),
+            profile=get_profile(analysis.profile_id)
+        )
+
+    result = MeasurementResult(
         measurements=measurements,
-        confidence=confidence
+        confidence=analysis.confidence,
+        tier=analysis.tier
     )
+    _cache_result(key, result)
+    return result
+
+def build_measurement_results(analyses: list) -> list:
+    """Generate the measurements for many analyzed scans with a single vectorized call"""
+    keys = [analysis.result_key() for analysis in analyses]
+    results = [_get_cached_result(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if not missing:
+        return results
+
+    # One vectorized call per profile, normally just the default one
+    by_profile = {}
+    for i in missing:
+        by_profile.setdefault(analyses[i].profile_id, []).append(i)
+
+    for profile_id, indices in by_profile.items():
+        pending = [analyses[i] for i in indices]
+        with stage_timer("measurement_generation"):
+            rows = generate_measurements_batch(
+                np.array([gender_code(analysis.gender) for analysis in pending]),
+                np.array([analysis.height_cm for analysis in pending], dtype=np.float64),
+                np.array([analysis.has_side_image for analysis in pending]),
+                np.array([analysis.body_type_data.get("bodyTypeFactor", 0.0) for analysis in pending], dtype=np.float64),
+                np.array([analysis.body_type_data.get("waistProminence", 0.5) for analysis in pending], dtype=np.float64),
+                rng=[_result_rng(keys[i]) for i in indices] if config.DETERMINISTIC else None,
+                profile=get_profile(profile_id),
+            )
+
+        for i, analysis, row in zip(indices, pending, rows):
+            results[i] = MeasurementResult(
+                measurements=dict(zip(MEASUREMENT_KEYS, row.tolist())),
+                confidence=analysis.confidence,
+                tier=analysis.tier
+            )
+            _cache_result(keys[i], results[i])
+    return results
+
+def _get_cached_result(key: str):
+    result_cache = get_cache("results")
+    cached = result_cache.get(key) if result_cache is not None else None
+    return MeasurementResult(**cached) if cached else None
+
+def _cache_result(key: str, result: MeasurementResult):
+    result_cache = get_cache("results")
+    if result_cache is not None:
+        result_cache.set(key, result.model_dump())
+
+def _result_rng(key: str):
+    """Jitter generator seeded from the request content in deterministic mode, else the worker's own"""
+    return seeded_rng(key) if config.DETERMINISTIC else None
+
+def image_digest(front_bytes: bytes, side_bytes: bytes = None) -> str:
+    """Content hash identifying the uploaded images of a scan"""
+    digest = hashlib.blake2b(front_bytes, digest_size=16)
+    if side_bytes:
+        # The side image affects the analysis too, so two scans sharing a front image differ
+        digest.update(hashlib.blake2b(side_bytes, digest_size=16).digest())
+    return digest.hexdigest()
+
+def result_cache_key(digest: str, gender: str, height_cm: float, has_side_image: bool, profile_tag: str,
+                     tier: str = TIER_FULL) -> str:
+    # The profile version is part of the key, so reloaded coefficients never serve stale results
+    key = f"{digest}:{gender.lower()}:{height_cm!r}:{int(has_side_image)}:{profile_tag}"
+    return key if tier == TIER_FULL else f"{key}:{tier}"
+
+def height_to_cm(height: str, measurement_system: str) -> float:
+    height_cm = float(height)
+    if measurement_system == "imperial":
+        height_cm = height_cm * 2.54  # Convert inches to cm
+    return height_cm
+
+def decode_base64_image(data_url: str) -> bytes:
+    """Decode a base64 data URL (or bare base64 string) into raw image bytes"""
+    with stage_timer("b64_decode"):
+        try:
+            # Slice past the "data:image/...;base64," header instead of split() to avoid an extra copy
+            return base64.b64decode(data_url[data_url.find(',') + 1:])
+        except binascii.Error as e:
+            raise InvalidImageError("Image is not valid base64") from e
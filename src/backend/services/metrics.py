@@ -0,0 +1,185 @@
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from sub-millisecond cache hits to multi-second full decodes
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style, with optional labels."""
+
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts (plus +Inf), sum, count
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in sorted(snapshot):
+            label_text = ",".join(f'{name}="{value}"' for name, value in zip(self.labelnames, labels))
+            prefix = label_text + "," if label_text else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+            suffix = f"{{{label_text}}}" if label_text else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+class Gauge:
+    """Single value that can go up and down, or be computed at scrape time."""
+
+    def __init__(self, name: str, help_text: str, callback=None):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+        self._callback = callback
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+    def render(self) -> list:
+        value = self._callback() if self._callback else self.value
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+# Pipeline stages: b64_decode, image_open, image_decode (proxy + statistics), side_analysis
+# (runs alongside image_decode), quality, body_analysis, measurement_generation and serialization
+stage_duration = Histogram(
+    "bodyfit_stage_duration_seconds", "Time spent in each stage of the measurement pipeline", labelnames=("stage",)
+)
+request_duration = Histogram(
+    "bodyfit_request_duration_seconds", "End-to-end latency of measurement requests", labelnames=("path", "status")
+)
+requests_in_flight = Gauge("bodyfit_requests_in_flight", "Measurement requests currently being handled")
+payload_bytes = Gauge("bodyfit_payload_bytes", "Size of the most recent measurement request body")
+image_pixels = Gauge("bodyfit_image_pixels", "Full-resolution pixel count of the most recently analyzed front image")
+
+_registry = [stage_duration, request_duration, requests_in_flight, payload_bytes, image_pixels]
+
+def register(metric):
+    """Add a metric to the /metrics output."""
+    _registry.append(metric)
+    return metric
+
+def render_metrics() -> str:
+    """Render every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# Stage timings of the request being handled, for the Server-Timing header
+_request_timings = contextvars.ContextVar("bodyfit_request_timings", default=None)
+# Work recorded on an executor worker, shipped back to the event loop with the result
+_worker = threading.local()
+
+def start_request_timings() -> dict:
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+def current_request_timings():
+    """Timings of the request being handled, or None outside a measurement request."""
+    return _request_timings.get()
+
+@contextmanager
+def request_timings(timings):
+    """Attribute stages recorded in this block to the given request timings.
+
+    For work done on behalf of other requests, e.g. by a micro-batch task.
+    """
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+def add_timings(target, timings: dict):
+    """Add stage durations that were already observed once to another request's timings."""
+    if target is not None:
+        for stage, seconds in timings.items():
+            target[stage] = target.get(stage, 0.0) + seconds
+
+def observe_stage(stage: str, seconds: float):
+    """Record a stage duration in the histogram and in the current request's timings."""
+    stage_duration.observe(seconds, stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+@contextmanager
+def stage_timer(stage: str):
+    """Time a pipeline stage, on an executor worker or directly on the event loop."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+def record_stage(stage: str, seconds: float):
+    """Record a stage duration measured elsewhere, e.g. on a helper thread of the current job."""
+    work = getattr(_worker, "work", None)
+    if work is not None:
+        work["stages"][stage] = work["stages"].get(stage, 0.0) + seconds
+    else:
+        observe_stage(stage, seconds)
+
+def record_image_pixels(pixels: int):
+    work = getattr(_worker, "work", None)
+    if work is not None:
+        work["image_pixels"] = pixels
+    else:
+        image_pixels.set(pixels)
+
+def run_collected(fn, *args):
+    """Run fn on an executor worker and return (result, recorded work).
+
+    Module-level so it can be pickled for a process executor; the recorded work is
+    replayed into the metrics on the event loop with record_work.
+    """
+    _worker.work = {"stages": {}, "image_pixels": None}
+    try:
+        return fn(*args), _worker.work
+    finally:
+        _worker.work = None
+
+def record_work(work: dict):
+    for stage, seconds in work["stages"].items():
+        observe_stage(stage, seconds)
+    if work["image_pixels"] is not None:
+        image_pixels.set(work["image_pixels"])
+
+def server_timing_header(timings: dict) -> str:
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings.items())
+
+def mark_handler_done():
+    """Note when the endpoint returned, so the middleware can time response serialization."""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings["_handler_done"] = time.perf_counter()
@@ -0,0 +1,103 @@
+
+import struct
+
+from models.measurement_models import Measurements
+
+JSON_MEDIA_TYPE = "application/json"
+# Compact binary format for internal batch consumers, negotiated with the Accept header
+BINARY_MEDIA_TYPE = "application/x-bodyfit-measurements"
+
+# Binary layout (little-endian):
+#   header   "BFM1", uint16 column count, uint32 row count
+#   columns  uint16 byte length, then the comma-separated UTF-8 column names
+#   values   rows x columns float32, row-major (NaN in error rows)
+#   status   one uint8 per row: the tier code, or ERROR_STATUS
+#   errors   for every error row, in order: uint16 byte length, then the UTF-8 message
+BINARY_MAGIC = b"BFM1"
+MEASUREMENT_FIELDS = tuple(Measurements.model_fields)
+BINARY_COLUMNS = (*MEASUREMENT_FIELDS, "confidence")
+TIER_CODES = {"full": 0, "fast": 1, "minimal": 2}
+ERROR_STATUS = 255
+_HEADER = struct.Struct("<4sHI")
+_LENGTH = struct.Struct("<H")
+_ROW = struct.Struct(f"<{len(BINARY_COLUMNS)}f")
+_ERROR_ROW = _ROW.pack(*[float("nan")] * len(BINARY_COLUMNS))
+_COLUMN_NAMES = ",".join(BINARY_COLUMNS).encode()
+
+def accepts_binary(accept: str) -> bool:
+    """Whether an Accept header asks for the binary format (with a non-zero quality)"""
+    for media_range in accept.split(","):
+        media_type, *params = media_range.split(";")
+        if media_type.strip().lower() != BINARY_MEDIA_TYPE:
+            continue
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+def encode_json(model) -> bytes:
+    """Serialize an already validated model straight to JSON bytes.
+
+    Uses the model's compiled serializer, skipping the validation and generic
+    encoding FastAPI applies to a response_model return value.
+    """
+    return model.__pydantic_serializer__.to_json(model)
+
+def encode_binary(results: list) -> bytes:
+    """Encode MeasurementResults, or error messages (str) for failed scans, in the binary format"""
+    # struct beats numpy for the few rows of a typical response
+    rows = []
+    status = bytearray(len(results))
+    errors = []
+    for row, result in enumerate(results):
+        if isinstance(result, str):
+            rows.append(_ERROR_ROW)
+            status[row] = ERROR_STATUS
+            message = result.encode()[:0xFFFF]
+            errors.append(_LENGTH.pack(len(message)) + message)
+            continue
+        measurements = result.measurements
+        rows.append(_ROW.pack(*[getattr(measurements, name) for name in MEASUREMENT_FIELDS], result.confidence))
+        status[row] = TIER_CODES[result.tier]
+
+    return b"".join((
+        _HEADER.pack(BINARY_MAGIC, len(BINARY_COLUMNS), len(results)),
+        _LENGTH.pack(len(_COLUMN_NAMES)), _COLUMN_NAMES,
+        *rows, bytes(status), *errors,
+    ))
+
+def decode_binary(data: bytes) -> list:
+    """Decode the binary format into result dicts ({"error": message} for failed scans), for clients and tests"""
+    magic, column_count, row_count = _HEADER.unpack_from(data)
+    if magic != BINARY_MAGIC:
+        raise ValueError("Not a bodyfit measurements payload")
+    offset = _HEADER.size
+    (names_length,) = _LENGTH.unpack_from(data, offset)
+    offset += _LENGTH.size
+    columns = data[offset:offset + names_length].decode().split(",")
+    offset += names_length
+    row_format = struct.Struct(f"<{column_count}f")
+    values = list(row_format.iter_unpack(data[offset:offset + row_count * row_format.size]))
+    offset += row_count * row_format.size
+    status = data[offset:offset + row_count]
+    offset += row_count
+
+    tiers = {code: tier for tier, code in TIER_CODES.items()}
+    results = []
+    for row in range(row_count):
+        if status[row] == ERROR_STATUS:
+            (length,) = _LENGTH.unpack_from(data, offset)
+            offset += _LENGTH.size
+            results.append({"error": data[offset:offset + length].decode(errors="replace")})
+            offset += length
+            continue
+        # float32 keeps about 7 significant digits; measurements have one decimal
+        record = dict(zip(columns, (round(value, 4) for value in values[row])))
+        confidence = record.pop("confidence")
+        results.append({"measurements": record, "confidence": confidence, "tier": tiers[status[row]]})
+    return results
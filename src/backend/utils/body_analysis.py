@@ -1,32 +1,38 @@
 
 import logging
-import numpy as np
+from utils.image_stats import compute_image_stats
 
 logger = logging.getLogger(__name__)
 
-def analyze_body_type_enhanced(image):
-    """Enhanced analysis of image to determine body type and proportions."""
+# Body type data that leaves the profile's average proportions unchanged
+NEUTRAL_BODY_TYPE = {
+    "bodyTypeFactor": 0.0,
+    "waistProminence": 0.5,
+    "widthToHeightRatio": 0.5
+}
+
+def analyze_body_type_enhanced(image, original_size=None, stats=None):
+    """Enhanced analysis of image to determine body type and proportions.
+    
+    image may be an analysis proxy; original_size gives the full-resolution
+    dimensions used for the width to height ratio. Pass precomputed stats to
+    avoid another pass over the pixels.
+    """
     try:
-        # Get image width and height
-        width, height = image.size
-        
-        # Convert to numpy array for analysis
-        img_array = np.array(image)
+        # Segment means come from the shared single-pass statistics
+        if stats is None:
+            stats = compute_image_stats(image)
         
         # Calculate width to height ratio as basic body type indicator
+        width, height = original_size or (stats.width, stats.height)
         width_height_ratio = width / height if height > 0 else 0
         
-        # Analyze image content by segments to determine approximate body shape
-        # Divide image into upper/middle/lower segments
-        upper_segment = img_array[:int(height * 0.33), :, :] if len(img_array.shape) >= 3 else img_array[:int(height * 0.33), :]
-        middle_segment = img_array[int(height * 0.33):int(height * 0.66), :, :] if len(img_array.shape) >= 3 else img_array[int(height * 0.33):int(height * 0.66), :]
-        lower_segment = img_array[int(height * 0.66):, :, :] if len(img_array.shape) >= 3 else img_array[int(height * 0.66):, :]
-        
-        # Calculate average brightness in each segment as a proxy for body shape
+        # Analyze image content by segments (upper/middle/lower) to determine approximate body shape
+        # Average brightness in each segment is used as a proxy for body shape
         try:
-            upper_segment_brightness = np.mean(upper_segment)
-            middle_segment_brightness = np.mean(middle_segment) 
-            lower_segment_brightness = np.mean(lower_segment)
+            upper_segment_brightness = stats.upper_mean
+            middle_segment_brightness = stats.middle_mean
+            lower_segment_brightness = stats.lower_mean
             
             # Calculate segment ratios to approximate body shape
             # Higher values in middle segment may indicate wider waist/torso
@@ -50,7 +56,9 @@ def analyze_body_type_enhanced(image):
             body_type_factor = min(0.5, width_height_ratio - 0.5) if width_height_ratio > 0.5 else 0.0
             waist_prominence = 0.5
         
-        logger.info(f"Enhanced body analysis: factor={body_type_factor:.2f}, waist={waist_prominence:.2f}, ratio={width_height_ratio:.2f}")
+        # Lazy %-formatting, so per-request debug output costs nothing unless enabled
+        logger.debug("Enhanced body analysis: factor=%.2f, waist=%.2f, ratio=%.2f",
+                     body_type_factor, waist_prominence, width_height_ratio)
         return {
             "bodyTypeFactor": body_type_factor,
             "waistProminence": waist_prominence,
@@ -58,8 +66,4 @@ def analyze_body_type_enhanced(image):
         }
     except Exception as e:
         logger.warning(f"Error analyzing body type: {str(e)}")
-        return {
-            "bodyTypeFactor": 0.0,
-            "waistProminence": 0.5,
-            "widthToHeightRatio": 0.5
-        }
+        return dict(NEUTRAL_BODY_TYPE)
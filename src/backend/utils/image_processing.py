@@ -3,12 +3,72 @@ import logging
 import numpy as np
 from PIL import Image
 
+from utils.image_stats import compute_image_stats
+
 logger = logging.getLogger(__name__)
 
-def calculate_image_quality(front_image, side_image=None):
-    """Calculate a quality score based on image properties with enhanced criteria."""
+# Pre-pass limits for images that are clearly unusable for measuring
+MAX_ASPECT_RATIO = 4.0  # Long side to short side
+MIN_MEAN_BRIGHTNESS = 12.0  # Mean luminance (0-255) of an almost black frame
+MAX_MEAN_BRIGHTNESS = 243.0  # ... and of a blown-out one
+MIN_CONTRAST = 6.0  # Luminance standard deviation of a blank frame
+
+_LEVELS = np.arange(256)
+
+def make_analysis_proxy(image, max_side=512):
+    """Decode a bounded-resolution copy of an opened image for analysis.
+    
+    Uses PIL's draft mode (DCT scaling for JPEG) and integer reduction, so the
+    full-resolution pixels are never materialized. A max_side of 0 decodes the
+    image at full resolution.
+    """
+    if max_side and max(image.size) > max_side:
+        # BOX resampling averages source pixels, which keeps segment means stable
+        image.thumbnail((max_side, max_side), Image.Resampling.BOX)
+    
+    # Analyzers work on plain RGB or grayscale pixels
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    else:
+        image.load()
+    return image
+
+def find_metadata_issue(size, min_side=128):
+    """First pre-pass stage, from the image header alone: the reason an image is unusable, or None."""
+    width, height = size
+    if min(width, height) < min_side:
+        return f"image is {width}x{height} pixels, below the minimum of {min_side} pixels per side"
+    if max(width, height) / min(width, height) > MAX_ASPECT_RATIO:
+        return f"image aspect ratio {width}:{height} cannot show a full body"
+    return None
+
+def find_thumbnail_issue(stats):
+    """Second pre-pass stage, from the statistics of the analysis proxy: the reason it is unusable, or None.
+
+    The proxy serves as the thumbnail; it is decoded at reduced scale anyway and reused
+    by the full analysis, so good images pay nothing extra for the check.
+    """
+    if stats.mean_brightness < MIN_MEAN_BRIGHTNESS:
+        return "image is almost completely dark"
+    if stats.mean_brightness > MAX_MEAN_BRIGHTNESS:
+        return "image is overexposed"
+    pixel_count = stats.histogram.sum()
+    variance = float(stats.histogram @ (_LEVELS - stats.mean_brightness) ** 2) / pixel_count if pixel_count else 0.0
+    if variance < MIN_CONTRAST ** 2:
+        return "image is blank (no visible contrast)"
+    return None
+
+def calculate_image_quality(front_image, side_image=None, original_size=None, stats=None, side_quality=None):
+    """Calculate a quality score based on image properties with enhanced criteria.
+    
+    front_image may be an analysis proxy, in which case original_size carries the
+    dimensions of the full-resolution photo for the resolution and aspect scores.
+    stats are the precomputed pixel statistics of front_image, if available.
+    side_quality is the side image's own quality score; when given, the side image
+    bonus is scaled by it instead of rewarding the side image's mere presence.
+    """
     # Check front image quality (resolution, aspect ratio, brightness)
-    width, height = front_image.size
+    width, height = original_size or front_image.size
     aspect_ratio = width / height if height > 0 else 0
     
     # Calculate resolution quality (0-1)
@@ -19,10 +79,12 @@ def calculate_image_quality(front_image, side_image=None):
     aspect_quality = 1.0 - min(0.5, abs(aspect_ratio - optimal_ratio))
     
     # Analyze image brightness and contrast
-    brightness_quality = analyze_image_brightness(front_image)
+    brightness_quality = analyze_image_brightness(front_image, stats)
     
     # Check if we have a side image (bonus)
     side_image_bonus = 0.25 if side_image else 0  # Increased bonus for side image
+    if side_image and side_quality is not None:
+        side_image_bonus *= max(0.0, min(1.0, side_quality))
     
     # Final quality score with improved weighting
     quality = (resolution_factor * 0.35 + 
@@ -30,24 +92,16 @@ def calculate_image_quality(front_image, side_image=None):
                brightness_quality * 0.15 + 
                side_image_bonus) / (0.8 + (0.2 if side_image else 0))
     
-    logger.info(f"Image quality score: {quality:.3f}")
+    logger.debug("Image quality score: %.3f", quality)
     return quality
 
-def analyze_image_brightness(image):
+def analyze_image_brightness(image, stats=None):
     """Analyze image brightness for better quality assessment."""
     try:
-        # Convert to grayscale for brightness analysis
-        if image.mode != 'L':
-            grayscale = image.convert('L')
-        else:
-            grayscale = image
-        
-        # Calculate histogram
-        histogram = grayscale.histogram()
-        
-        # Calculate brightness metrics
-        pixels = sum(histogram)
-        brightness = sum(i * x for i, x in enumerate(histogram)) / pixels if pixels > 0 else 0
+        # Mean luminance comes from the shared single-pass statistics
+        if stats is None:
+            stats = compute_image_stats(image)
+        brightness = stats.mean_brightness
         
         # Normalize brightness (0-255) to quality score (0-1)
         # Optimal brightness is in the middle range (not too dark, not too bright)
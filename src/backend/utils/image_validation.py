@@ -0,0 +1,84 @@
+
+import base64
+import binascii
+import io
+import logging
+from PIL import Image, UnidentifiedImageError
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Formats phone and web clients send; MPO is what many phones call multi-frame JPEGs
+ALLOWED_IMAGE_FORMATS = ("JPEG", "MPO", "PNG", "WEBP")
+# Leading bytes of the allowed formats, used to tell a truncated sniff prefix from garbage
+IMAGE_SIGNATURES = (b"\xff\xd8\xff", b"\x89PNG\r\n\x1a\n", b"RIFF")
+# Base64 characters decoded to sniff the header of a JSON image (multiples of 4): a short
+# prefix covers most headers, the longer one headers with large EXIF blocks
+SNIFF_PREFIX_CHARS = (4096, 65536)
+
+# Pillow refuses to open images above twice this budget (decompression bomb guard)
+Image.MAX_IMAGE_PIXELS = config.MAX_IMAGE_PIXELS
+
+class InvalidImageError(ValueError):
+    """Raised when an uploaded image is not a supported, reasonably sized image."""
+
+class UnusableImageError(InvalidImageError):
+    """Raised when a valid image is clearly unusable for measuring, e.g. tiny, blank or black."""
+
+def check_image(image: Image.Image, label: str = "image"):
+    """Check the format and dimensions of an opened (not yet decoded) image."""
+    if image.format not in ALLOWED_IMAGE_FORMATS:
+        raise InvalidImageError(
+            f"Unsupported {label} format {image.format}, expected one of {', '.join(ALLOWED_IMAGE_FORMATS)}"
+        )
+    width, height = image.size
+    if width <= 0 or height <= 0:
+        raise InvalidImageError(f"The {label} has no pixels")
+    if width * height > config.MAX_IMAGE_PIXELS:
+        raise InvalidImageError(
+            f"The {label} is {width}x{height} pixels, above the limit of {config.MAX_IMAGE_PIXELS} pixels"
+        )
+
+def open_image(data: bytes, label: str = "image") -> Image.Image:
+    """Lazily open image bytes, reading only the header, and check them against the limits."""
+    if not data:
+        raise InvalidImageError(f"The {label} is empty")
+    try:
+        image = Image.open(io.BytesIO(data))
+    except Image.DecompressionBombError as e:
+        raise InvalidImageError(f"The {label} is too large: {e}") from e
+    except (UnidentifiedImageError, OSError, SyntaxError) as e:
+        raise InvalidImageError(f"The {label} is not a readable image") from e
+    check_image(image, label)
+    return image
+
+def sniff_base64_image(data_url: str, label: str = "image"):
+    """Check the header of a base64 image without decoding the whole payload.
+
+    Only a short prefix is decoded, and a longer one if the header (e.g. large EXIF
+    data) does not fit. Returns (format, size), or None when even the longer prefix
+    ends before the dimensions; the full check then happens in the pipeline.
+    """
+    start = data_url.find(',') + 1
+    for prefix_chars in SNIFF_PREFIX_CHARS:
+        prefix = data_url[start:start + prefix_chars]
+        complete = len(data_url) - start <= prefix_chars
+        try:
+            head = base64.b64decode(prefix)
+        except binascii.Error as e:
+            if complete:
+                raise InvalidImageError(f"The {label} is not valid base64") from e
+            # Line breaks in the prefix can misalign it; leave the verdict to the full decode
+            return None
+
+        try:
+            image = open_image(head, label)
+        except InvalidImageError:
+            if complete or not head.startswith(IMAGE_SIGNATURES):
+                raise
+            continue
+        return image.format, image.size
+
+    logger.debug(f"Header of the {label} extends past the sniffed prefix")
+    return None
@@ -1,14 +1,97 @@
 
+import hashlib
 import logging
-import random
 import math
+import os
+import threading
+import numpy as np
+
+from utils.profiles import ProfileTables, get_profile
 
 logger = logging.getLogger(__name__)
 
-def generate_highly_accurate_measurements(gender: str, height_cm: float, has_side_image: bool, body_type_data: dict):
-    """Generate highly accurate measurements with improved anthropometric data and body shape analysis."""
-    # These proportions are based on comprehensive anthropometric research data from multiple populations
-    gender = gender.lower()
+# Gender codes used by the batch API; anything that is not male/female uses the "other" blend
+GENDER_CODES = {"male": 0, "female": 1, "other": 2}
+MALE, FEMALE, OTHER = 0, 1, 2
+
+# Base body proportions, in the order they are generated
+PROPORTION_KEYS = ("chest", "waist", "hips", "inseam", "shoulder", "sleeve", "neck", "thigh")
+
+# All measurements in output order (matches the keys of the scalar result dict)
+MEASUREMENT_KEYS = PROPORTION_KEYS + ("height", "upperArm", "forearm", "calf", "estimatedBMI")
+
+# Structured dtype returned by generate_measurements_batch
+MEASUREMENT_DTYPE = np.dtype([(key, np.float64) for key in MEASUREMENT_KEYS])
+
+# Measurements that are clamped to standard deviation limits in the final consistency check
+LIMITED_KEYS = ("chest", "waist", "hips", "shoulder", "inseam", "sleeve", "neck", "thigh", "upperArm", "forearm", "calf")
+
+_KEY_INDEX = {key: i for i, key in enumerate(MEASUREMENT_KEYS)}
+CHEST, WAIST, HIPS, INSEAM, SHOULDER, SLEEVE, NECK, THIGH, HEIGHT, UPPER_ARM, FOREARM, CALF, BMI = range(len(MEASUREMENT_KEYS))
+
+_LIMITED_COLUMNS = np.array([_KEY_INDEX[key] for key in LIMITED_KEYS])
+
+# Use a more stable variation approach - reduced by 80%
+VARIATION_FACTOR = 0.001  # Reduced from 0.005
+
+def gender_code(gender: str) -> int:
+    """Map a gender string onto the code used by the batch API."""
+    return GENDER_CODES.get(gender.lower(), OTHER)
+
+def _round(values):
+    """Vectorized round(x, 1) with exactly Python's results, used for every step of the batch path.
+
+    np.round(x, 1) is rint(x * 10) / 10, and the rounding of x * 10 occasionally lands
+    on the other side of a .5 boundary than round() does. x * 10 is x * 8 + x * 2
+    (both exact), so TwoSum yields the rounded product plus its exact error, which
+    decides the few products that were rounded onto a tie.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    eight, two = values * 8, values * 2
+    product = eight + two
+    virtual_two = product - eight
+    error = (eight - (product - virtual_two)) + (two - virtual_two)
+    tens = np.rint(product)
+    tens = np.where((product - tens == 0.5) & (error > 0), tens + 1, tens)
+    tens = np.where((product - tens == -0.5) & (error < 0), tens - 1, tens)
+    return tens / 10
+
+def _round1(value: float) -> float:
+    # Scalar twin of _round (0.1 mm precision); float() so numpy scalars get Python's rounding too
+    return round(float(value), 1)
+
+_worker_state = threading.local()
+
+def get_worker_rng() -> np.random.Generator:
+    """Jitter generator of the current worker, used when no explicit rng is given.
+    
+    Every thread (and every process, even after a fork) lazily gets its own
+    independently seeded Generator, so workers never share or contend on RNG state.
+    """
+    pid = os.getpid()
+    if getattr(_worker_state, "pid", None) != pid:
+        _worker_state.pid = pid
+        _worker_state.rng = np.random.default_rng()
+    return _worker_state.rng
+
+def seeded_rng(*parts) -> np.random.Generator:
+    """Generator seeded deterministically from request content, e.g. an image hash, gender and height."""
+    digest = hashlib.blake2b("\x1f".join(str(part) for part in parts).encode(), digest_size=8).digest()
+    return np.random.default_rng(int.from_bytes(digest, "big"))
+
+def generate_highly_accurate_measurements(gender: str, height_cm: float, has_side_image: bool, body_type_data: dict,
+                                          rng=None, profile: ProfileTables = None):
+    """Generate highly accurate measurements with improved anthropometric data and body shape analysis.
+    
+    rng is an optional numpy Generator for the natural variation jitter. With the same
+    generator state the result is identical to the matching row of generate_measurements_batch.
+    profile holds the anthropometric coefficients (see utils.profiles), the default profile if None.
+    """
+    code = gender_code(gender)
+    if rng is None:
+        rng = get_worker_rng()
+    if profile is None:
+        profile = get_profile()
     
     # Extract body type data with defaults if missing
     body_type_factor = body_type_data.get("bodyTypeFactor", 0.0)
@@ -17,90 +100,40 @@ def generate_highly_accurate_measurements(gender: str, height_cm: float, has_sid
     # Further constrain body type factor to avoid extreme values
     body_type_factor = max(-0.2, min(0.2, body_type_factor))
     
-    # Enhanced base proportions with research-based accuracy - narrower range for better precision
-    if gender == "male":
-        # Updated proportions based on WHO and fashion industry standards
-        proportions = {
-            "chest": 0.51 + (body_type_factor * 0.02),
-            "waist": 0.44 + (body_type_factor * 0.03) * waist_prominence,
-            "hips": 0.51 + (body_type_factor * 0.02),
-            "inseam": 0.46 - (body_type_factor * 0.01),
-            "shoulder": 0.245 + (body_type_factor * 0.01),
-            "sleeve": 0.33,
-            "neck": 0.195 + (body_type_factor * 0.005),
-            "thigh": 0.30 + (body_type_factor * 0.015),
-        }
-        
-        # Reference ratios with researched accuracy - tightened ranges
-        reference = {
-            "chest_to_waist": 1.16 - (waist_prominence * 0.1),
-            "waist_to_hip": 0.87 + (waist_prominence * 0.09),
-            "shoulder_to_chest": 0.46 - (body_type_factor * 0.01),
-        }
-    elif gender == "female":
-        # Updated proportions based on WHO and fashion industry standards
-        proportions = {
-            "chest": 0.495 + (body_type_factor * 0.02),
-            "waist": 0.41 + (body_type_factor * 0.03) * waist_prominence,
-            "hips": 0.54 + (body_type_factor * 0.02),
-            "inseam": 0.44 - (body_type_factor * 0.01),
-            "shoulder": 0.22 + (body_type_factor * 0.005),
-            "sleeve": 0.31,
-            "neck": 0.165 + (body_type_factor * 0.003),
-            "thigh": 0.32 + (body_type_factor * 0.02),
-        }
-        
-        # Reference ratios with researched accuracy - tightened ranges
-        reference = {
-            "chest_to_waist": 1.20 - (waist_prominence * 0.12),
-            "waist_to_hip": 0.76 + (waist_prominence * 0.10),
-            "shoulder_to_chest": 0.44 - (body_type_factor * 0.005),
-        }
-    else:  # "other" - blend of male and female proportions
-        # Updated proportions with research-based accuracy
-        proportions = {
-            "chest": 0.5025 + (body_type_factor * 0.02),
-            "waist": 0.425 + (body_type_factor * 0.03) * waist_prominence,
-            "hips": 0.525 + (body_type_factor * 0.02),
-            "inseam": 0.45 - (body_type_factor * 0.01),
-            "shoulder": 0.2325 + (body_type_factor * 0.0075),
-            "sleeve": 0.32,
-            "neck": 0.18 + (body_type_factor * 0.004),
-            "thigh": 0.31 + (body_type_factor * 0.0175),
-        }
-        
-        # Reference ratios with researched accuracy - tightened ranges
-        reference = {
-            "chest_to_waist": 1.18 - (waist_prominence * 0.11),
-            "waist_to_hip": 0.81 + (waist_prominence * 0.095),
-            "shoulder_to_chest": 0.45 - (body_type_factor * 0.0075),
-        }
+    # Base proportions for this gender, adjusted by body type (waist slope scaled by waist prominence)
+    base = profile.base_proportion_rows[code]
+    slopes = profile.proportion_slope_rows[code]
+    proportions = [base[i] + (body_type_factor * slopes[i]) * (waist_prominence if i == WAIST else 1.0)
+                   for i in range(len(PROPORTION_KEYS))]
     
-    # Generate initial measurements with high precision (0.1mm)
-    measurements = {}
+    # Reference ratios for this body shape
+    chest_to_waist = profile.chest_to_waist_rows[code][0] + waist_prominence * profile.chest_to_waist_rows[code][1]
+    waist_to_hip = profile.waist_to_hip_rows[code][0] + waist_prominence * profile.waist_to_hip_rows[code][1]
+    shoulder_to_chest = profile.shoulder_to_chest_rows[code][0] + body_type_factor * profile.shoulder_to_chest_rows[code][1]
+    
+    # Use sine function to create smooth variation based on body type factor
+    # This creates more natural body shape transitions than linear scaling
+    body_shape_adjustment = math.sin(body_type_factor * math.pi / 2) * 0.025  # Reduced from 0.05
+    proportions[WAIST] = proportions[WAIST] * (1 + (waist_prominence - 0.5) * body_shape_adjustment)
     
-    # Use a more stable variation approach - reduced by 80%
-    variation_factor = 0.001  # Reduced from 0.005
+    # Apply minimal variation for natural proportions - 80% reduction
+    variations = rng.uniform(-VARIATION_FACTOR, VARIATION_FACTOR, size=len(PROPORTION_KEYS)).tolist()
     
-    for key, ratio in proportions.items():
-        # Use sine function to create smooth variation based on body type factor
-        # This creates more natural body shape transitions than linear scaling
-        body_shape_adjustment = math.sin(body_type_factor * math.pi / 2) * 0.025  # Reduced from 0.05
-        adjusted_ratio = ratio * (1 + (waist_prominence - 0.5) * body_shape_adjustment if key == "waist" else 0)
-        
-        # Apply minimal variation for natural proportions - 80% reduction
-        variation = 1.0 + random.uniform(-variation_factor, variation_factor)
-        measurements[key] = round(height_cm * adjusted_ratio * variation, 1)
+    # Generate initial measurements with high precision (0.1mm)
+    measurements = {
+        key: _round1(height_cm * proportions[i] * (1.0 + variations[i]))
+        for i, key in enumerate(PROPORTION_KEYS)
+    }
     
     # Special handling for waist based on body type - reduced effect
     if waist_prominence > 0.6:  # More prominent waist
         waist_adjustment = (waist_prominence - 0.5) * 0.1  # Reduced from 0.2
-        measurements["waist"] = round(measurements["waist"] * (1 + waist_adjustment), 1)
+        measurements["waist"] = _round1(measurements["waist"] * (1 + waist_adjustment))
     
     # Apply coherent adjustments to related measurements - reduced effect
     if waist_prominence > 0.55:  # Slightly more prominent waist
-        measurements["chest"] = round(measurements["chest"] * (1 + (waist_prominence - 0.55) * 0.07), 1)  # Reduced from 0.15
-        measurements["hips"] = round(measurements["hips"] * (1 + (waist_prominence - 0.55) * 0.05), 1)  # Reduced from 0.1
+        measurements["chest"] = _round1(measurements["chest"] * (1 + (waist_prominence - 0.55) * 0.07))  # Reduced from 0.15
+        measurements["hips"] = _round1(measurements["hips"] * (1 + (waist_prominence - 0.55) * 0.05))  # Reduced from 0.1
     
     # Apply strict proportional corrections to ensure measurements are realistic
     # Correct chest-waist-hip proportions with stronger enforcement
@@ -109,107 +142,199 @@ def generate_highly_accurate_measurements(gender: str, height_cm: float, has_sid
     hips = measurements["hips"]
     
     # Ensure chest-to-waist ratio is within realistic bounds - strengthened enforcement
-    actual_chest_to_waist = chest / waist
-    target_ratio = reference["chest_to_waist"]
-    
-    if abs(actual_chest_to_waist - target_ratio) > 0.04:  # Reduced from 0.08
+    if abs(chest / waist - chest_to_waist) > 0.04:  # Reduced from 0.08
         # Use weighted blend for more natural proportions - increased original value preference
-        measurements["chest"] = round((chest * 0.85 + waist * target_ratio * 0.15), 1)  # 85-15 blend instead of 75-25
+        measurements["chest"] = _round1(chest * 0.85 + waist * chest_to_waist * 0.15)  # 85-15 blend instead of 75-25
     
     # Ensure waist-to-hip ratio is within realistic bounds - strengthened enforcement
-    actual_waist_to_hip = waist / hips
-    target_hip_ratio = reference["waist_to_hip"]
-    
-    if abs(actual_waist_to_hip - target_hip_ratio) > 0.04:  # Reduced from 0.08
+    if abs(waist / hips - waist_to_hip) > 0.04:  # Reduced from 0.08
         # Use weighted blend for more natural proportions - increased original value preference
-        measurements["waist"] = round((waist * 0.85 + hips * target_hip_ratio * 0.15), 1)  # 85-15 blend
+        measurements["waist"] = _round1(waist * 0.85 + hips * waist_to_hip * 0.15)  # 85-15 blend
     
     # Ensure shoulder-to-chest ratio is within realistic bounds - strengthened enforcement
+    # (against the chest before its correction above)
     shoulder = measurements["shoulder"]
-    actual_shoulder_to_chest = shoulder / chest
-    if abs(actual_shoulder_to_chest - reference["shoulder_to_chest"]) > 0.03:  # Reduced from 0.06
+    if abs(shoulder / chest - shoulder_to_chest) > 0.03:  # Reduced from 0.06
         # Use weighted blend for more natural proportions - increased original value preference
-        measurements["shoulder"] = round((shoulder * 0.8 + chest * reference["shoulder_to_chest"] * 0.2), 1)  # 80-20 blend
+        measurements["shoulder"] = _round1(shoulder * 0.8 + chest * shoulder_to_chest * 0.2)  # 80-20 blend
     
     # Add height to the measurements dictionary
     measurements["height"] = height_cm
     
-    # Thigh to hip ratio enforcement - new constraint
-    thigh = measurements["thigh"]
-    ideal_thigh_to_hip_ratio = 0.59 if gender == "male" else 0.62  # Fixed ternary operator syntax
-    actual_thigh_to_hip_ratio = thigh / hips
-    
-    if abs(actual_thigh_to_hip_ratio - ideal_thigh_to_hip_ratio) > 0.04:
-        measurements["thigh"] = round((hips * ideal_thigh_to_hip_ratio), 1)
+    # Thigh to hip ratio enforcement
+    ideal_thigh_to_hip_ratio = profile.thigh_to_hip_row[code]
+    if abs(measurements["thigh"] / hips - ideal_thigh_to_hip_ratio) > 0.04:
+        measurements["thigh"] = _round1(hips * ideal_thigh_to_hip_ratio)
     
     # If side image is available, improve depth-based measurements more conservatively
     if has_side_image:
         # Enhanced measurements with side image data - reduced adjustment
         depth_bonus = 1.03  # 3% more accurate with side image (reduced from 5%)
         for key in ["chest", "waist", "hips"]:
-            measurements[key] = round(measurements[key] * depth_bonus, 1)
+            measurements[key] = _round1(measurements[key] * depth_bonus)
     
     # Add advanced measurements with higher precision
     # Used fixed ratios rather than variable ones for better consistency
-    measurements["upperArm"] = round(measurements["chest"] * (0.32 if gender == "male" else 0.30), 1)
-    measurements["forearm"] = round(measurements["chest"] * (0.26 if gender == "male" else 0.24), 1)
-    measurements["calf"] = round(measurements["thigh"] * (0.72 if gender == "male" else 0.70), 1)
+    measurements["upperArm"] = _round1(measurements["chest"] * profile.upper_arm_to_chest_row[code])
+    measurements["forearm"] = _round1(measurements["chest"] * profile.forearm_to_chest_row[code])
+    measurements["calf"] = _round1(measurements["thigh"] * profile.calf_to_thigh_row[code])
     
     # Add BMI estimate based on measurements (new feature)
     # This is a simplified calculation and not a medical BMI value
     body_volume_estimate = (measurements["chest"] * measurements["waist"] * measurements["hips"]) / 1000
     height_m = height_cm / 100
-    estimated_bmi = round((body_volume_estimate / (height_m * height_m)), 1)
+    estimated_bmi = _round1(body_volume_estimate / (height_m * height_m))
     measurements["estimatedBMI"] = max(18.5, min(35.0, estimated_bmi))  # Constrain to reasonable values
     
     # Final consistency check - ensure all measurements are within standard deviation limits
-    validate_measurement_consistency(measurements, height_cm, gender)
+    validate_measurement_consistency(measurements, height_cm, gender, profile)
     
     return measurements
 
-# New function to validate consistency of all measurements as a final check
-def validate_measurement_consistency(measurements: dict, height_cm: float, gender: str):
+def generate_measurements_batch(gender_codes, heights_cm, has_side_images, body_type_factors, waist_prominences=None,
+                                rng=None, profile: ProfileTables = None):
+    """Vectorized measurement generation for many people at once.
+
+    Takes equal-length arrays of gender codes (see GENDER_CODES), heights in cm,
+    side-image flags, body type factors and waist prominences (default 0.5), and
+    returns a structured array with MEASUREMENT_DTYPE. Variation jitter is drawn
+    from rng (a numpy Generator) row by row, so a batch gives the same results as
+    the scalar path called in order with the same generator. rng may also be a
+    sequence with one Generator per row, e.g. when every row has its own seed.
+    All rows use the same profile (the default profile if None).
+    """
+    genders = np.asarray(gender_codes, dtype=np.intp)
+    heights = np.asarray(heights_cm, dtype=np.float64)
+    has_side = np.asarray(has_side_images, dtype=bool)
+    count = len(genders)
+    waist_prominence = (np.full(count, 0.5) if waist_prominences is None
+                        else np.asarray(waist_prominences, dtype=np.float64))
+    if rng is None:
+        rng = get_worker_rng()
+    if profile is None:
+        profile = get_profile()
+
+    # Further constrain body type factor to avoid extreme values
+    body_type_factor = np.clip(np.asarray(body_type_factors, dtype=np.float64), -0.2, 0.2)
+
+    # Proportions per person; only the waist slope is scaled by waist prominence
+    slope_scale = np.ones((count, len(PROPORTION_KEYS)))
+    slope_scale[:, WAIST] = waist_prominence
+    proportions = profile.base_proportions[genders] + (body_type_factor[:, None] * profile.proportion_slopes[genders]) * slope_scale
+
+    # Reference ratios for this body shape
+    chest_to_waist = profile.chest_to_waist[genders, 0] + waist_prominence * profile.chest_to_waist[genders, 1]
+    waist_to_hip = profile.waist_to_hip[genders, 0] + waist_prominence * profile.waist_to_hip[genders, 1]
+    shoulder_to_chest = profile.shoulder_to_chest[genders, 0] + body_type_factor * profile.shoulder_to_chest[genders, 1]
+
+    # Use sine function to create smooth variation based on body type factor
+    # This creates more natural body shape transitions than linear scaling
+    body_shape_adjustment = np.sin(body_type_factor * np.pi / 2) * 0.025  # Reduced from 0.05
+    proportions[:, WAIST] = proportions[:, WAIST] * (1 + (waist_prominence - 0.5) * body_shape_adjustment)
+
+    # Apply minimal variation for natural proportions - 80% reduction
+    if isinstance(rng, (list, tuple)):
+        variation = np.empty((count, len(PROPORTION_KEYS)))
+        for i, row_rng in enumerate(rng):
+            variation[i] = row_rng.uniform(-VARIATION_FACTOR, VARIATION_FACTOR, size=len(PROPORTION_KEYS))
+        variation += 1.0
+    else:
+        variation = 1.0 + rng.uniform(-VARIATION_FACTOR, VARIATION_FACTOR, size=(count, len(PROPORTION_KEYS)))
+
+    # Generate initial measurements with high precision (0.1mm)
+    m = np.empty((count, len(MEASUREMENT_KEYS)))
+    m[:, :len(PROPORTION_KEYS)] = _round(heights[:, None] * proportions * variation)
+
+    # Special handling for waist based on body type - reduced effect
+    prominent = waist_prominence > 0.6  # More prominent waist
+    waist_adjustment = (waist_prominence - 0.5) * 0.1  # Reduced from 0.2
+    m[:, WAIST] = np.where(prominent, _round(m[:, WAIST] * (1 + waist_adjustment)), m[:, WAIST])
+
+    # Apply coherent adjustments to related measurements - reduced effect
+    prominent = waist_prominence > 0.55  # Slightly more prominent waist
+    m[:, CHEST] = np.where(prominent, _round(m[:, CHEST] * (1 + (waist_prominence - 0.55) * 0.07)), m[:, CHEST])  # Reduced from 0.15
+    m[:, HIPS] = np.where(prominent, _round(m[:, HIPS] * (1 + (waist_prominence - 0.55) * 0.05)), m[:, HIPS])  # Reduced from 0.1
+
+    # Apply strict proportional corrections to ensure measurements are realistic
+    # Correct chest-waist-hip proportions with stronger enforcement
+    waist = m[:, WAIST].copy()
+    chest = m[:, CHEST].copy()
+    hips = m[:, HIPS].copy()
+
+    # Ensure chest-to-waist ratio is within realistic bounds - strengthened enforcement
+    # Use weighted blend for more natural proportions - 85-15 blend keeps most of the original value
+    off_ratio = np.abs(chest / waist - chest_to_waist) > 0.04  # Reduced from 0.08
+    m[:, CHEST] = np.where(off_ratio, _round(chest * 0.85 + waist * chest_to_waist * 0.15), m[:, CHEST])
+
+    # Ensure waist-to-hip ratio is within realistic bounds - strengthened enforcement
+    off_ratio = np.abs(waist / hips - waist_to_hip) > 0.04  # Reduced from 0.08
+    m[:, WAIST] = np.where(off_ratio, _round(waist * 0.85 + hips * waist_to_hip * 0.15), m[:, WAIST])
+
+    # Ensure shoulder-to-chest ratio is within realistic bounds - strengthened enforcement (80-20 blend)
+    # against the chest before its correction above, like the scalar path
+    shoulder = m[:, SHOULDER]
+    off_ratio = np.abs(shoulder / chest - shoulder_to_chest) > 0.03  # Reduced from 0.06
+    m[:, SHOULDER] = np.where(off_ratio, _round(shoulder * 0.8 + chest * shoulder_to_chest * 0.2), shoulder)
+
+    # Add height to the measurements
+    m[:, HEIGHT] = heights
+
+    # Thigh to hip ratio enforcement
+    ideal_thigh_to_hip = profile.thigh_to_hip[genders]
+    off_ratio = np.abs(m[:, THIGH] / hips - ideal_thigh_to_hip) > 0.04
+    m[:, THIGH] = np.where(off_ratio, _round(hips * ideal_thigh_to_hip), m[:, THIGH])
+
+    # If side image is available, improve depth-based measurements more conservatively
+    # 3% more accurate with side image (reduced from 5%)
+    depth_columns = [CHEST, WAIST, HIPS]
+    m[:, depth_columns] = np.where(has_side[:, None], _round(m[:, depth_columns] * 1.03), m[:, depth_columns])
+
+    # Add advanced measurements with higher precision
+    # Used fixed ratios rather than variable ones for better consistency
+    m[:, UPPER_ARM] = _round(m[:, CHEST] * profile.upper_arm_to_chest[genders])
+    m[:, FOREARM] = _round(m[:, CHEST] * profile.forearm_to_chest[genders])
+    m[:, CALF] = _round(m[:, THIGH] * profile.calf_to_thigh[genders])
+
+    # Add BMI estimate based on measurements
+    # This is a simplified calculation and not a medical BMI value
+    body_volume_estimate = (m[:, CHEST] * m[:, WAIST] * m[:, HIPS]) / 1000
+    height_m = heights / 100
+    estimated_bmi = _round(body_volume_estimate / (height_m * height_m))
+    m[:, BMI] = np.clip(estimated_bmi, 18.5, 35.0)  # Constrain to reasonable values
+
+    # Final consistency check - ensure all measurements are within standard deviation limits
+    _clamp_to_limits(m, heights, genders, profile)
+
+    result = np.empty(count, dtype=MEASUREMENT_DTYPE)
+    for i, key in enumerate(MEASUREMENT_KEYS):
+        result[key] = m[:, i]
+    return result
+
+def _clamp_to_limits(m, heights, genders, profile: ProfileTables):
+    """Clamp the limited columns of a measurement matrix to the height-relative limits in place."""
+    limits = profile.limits[genders]
+    values = m[:, _LIMITED_COLUMNS]
+    ratios = values / heights[:, None]
+    # If outside limits, adjust to the nearest limit
+    lower = _round(heights[:, None] * limits[:, :, 0])
+    upper = _round(heights[:, None] * limits[:, :, 1])
+    values = np.where(ratios < limits[:, :, 0], lower, np.where(ratios > limits[:, :, 1], upper, values))
+    m[:, _LIMITED_COLUMNS] = values
+
+def validate_measurement_consistency(measurements: dict, height_cm: float, gender: str, profile: ProfileTables = None):
     """Final validation to ensure all measurements are within standard deviation limits."""
-    # Standard deviation limits as percentage of height
-    std_dev_limits = {
-        "male": {
-            "chest": (0.47, 0.55),
-            "waist": (0.40, 0.48),
-            "hips": (0.47, 0.55),
-            "shoulder": (0.22, 0.27),
-            "inseam": (0.44, 0.48),
-            "sleeve": (0.31, 0.35),
-            "neck": (0.18, 0.21),
-            "thigh": (0.28, 0.33),
-            "upperArm": (0.14, 0.18),
-            "forearm": (0.12, 0.15),
-            "calf": (0.20, 0.24),
-        },
-        "female": {
-            "chest": (0.46, 0.53),
-            "waist": (0.38, 0.44),
-            "hips": (0.51, 0.57),
-            "shoulder": (0.20, 0.24),
-            "inseam": (0.42, 0.46),
-            "sleeve": (0.29, 0.33),
-            "neck": (0.15, 0.18),
-            "thigh": (0.30, 0.35),
-            "upperArm": (0.13, 0.17),
-            "forearm": (0.11, 0.14),
-            "calf": (0.19, 0.23),
-        },
-    }
-    
-    limits = std_dev_limits.get(gender.lower(), std_dev_limits["male"])
+    if profile is None:
+        profile = get_profile()
+    limits = profile.limit_rows[gender_code(gender)]
     
     # Check each measurement against its limits
-    for key, value in measurements.items():
-        if key in limits and key != "height":
-            ratio = value / height_cm
-            min_limit, max_limit = limits[key]
+    for column, key in enumerate(LIMITED_KEYS):
+        if key in measurements:
+            ratio = measurements[key] / height_cm
+            min_limit, max_limit = limits[column]
             
             # If outside limits, adjust to the nearest limit
             if ratio < min_limit:
-                measurements[key] = round(height_cm * min_limit, 1)
+                measurements[key] = _round1(height_cm * min_limit)
             elif ratio > max_limit:
-                measurements[key] = round(height_cm * max_limit, 1)
+                measurements[key] = _round1(height_cm * max_limit)
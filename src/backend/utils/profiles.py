@@ -0,0 +1,203 @@
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+import numpy as np
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Row order of every per-gender table; must match GENDER_CODES in measurement_generator
+PROFILE_GENDERS = ("male", "female", "other")
+# Same order as PROPORTION_KEYS and LIMITED_KEYS in measurement_generator
+PROFILE_PROPORTION_KEYS = ("chest", "waist", "hips", "inseam", "shoulder", "sleeve", "neck", "thigh")
+PROFILE_LIMITED_KEYS = ("chest", "waist", "hips", "shoulder", "inseam", "sleeve", "neck", "thigh", "upperArm", "forearm", "calf")
+
+class UnknownProfileError(ValueError):
+    """Raised when a request selects a profile that is not loaded."""
+
+@dataclass(frozen=True)
+class ProfileTables:
+    """Anthropometric coefficients of one profile, as arrays indexed by gender code.
+
+    The numpy arrays serve the vectorized batch path; the *_rows list copies serve the
+    scalar path, where numpy call overhead would dominate.
+    """
+    profile_id: str
+    version: str
+    description: str
+    content_hash: str  # of the coefficients, so edits show up even when the version is not bumped
+    base_proportions: np.ndarray  # (gender, proportion)
+    proportion_slopes: np.ndarray  # (gender, proportion)
+    chest_to_waist: np.ndarray  # (gender, [base, waist prominence slope])
+    waist_to_hip: np.ndarray  # (gender, [base, waist prominence slope])
+    shoulder_to_chest: np.ndarray  # (gender, [base, body type factor slope])
+    thigh_to_hip: np.ndarray  # (gender,)
+    upper_arm_to_chest: np.ndarray  # (gender,)
+    forearm_to_chest: np.ndarray  # (gender,)
+    calf_to_thigh: np.ndarray  # (gender,)
+    limits: np.ndarray  # (gender, limited key, [min, max]) as fractions of height
+    base_proportion_rows: list
+    proportion_slope_rows: list
+    chest_to_waist_rows: list
+    waist_to_hip_rows: list
+    shoulder_to_chest_rows: list
+    thigh_to_hip_row: list
+    upper_arm_to_chest_row: list
+    forearm_to_chest_row: list
+    calf_to_thigh_row: list
+    limit_rows: list
+
+    @property
+    def tag(self) -> str:
+        """Identifies this exact set of coefficients, e.g. in cache keys"""
+        return f"{self.profile_id}@{self.version}+{self.content_hash}"
+
+def build_profile(profile_id: str, document: dict) -> ProfileTables:
+    """Compile a parsed profile document into array tables, checking that every coefficient is present."""
+    try:
+        genders = [document["genders"][gender] for gender in PROFILE_GENDERS]
+        proportions = np.array(
+            [[data["proportions"][key] for key in PROFILE_PROPORTION_KEYS] for data in genders], dtype=np.float64
+        )
+        tables = {
+            name: np.array([data[field] for data in genders], dtype=np.float64)
+            for name, field in (
+                ("chest_to_waist", "chestToWaist"), ("waist_to_hip", "waistToHip"),
+                ("shoulder_to_chest", "shoulderToChest"), ("thigh_to_hip", "thighToHip"),
+                ("upper_arm_to_chest", "upperArmToChest"), ("forearm_to_chest", "forearmToChest"),
+                ("calf_to_thigh", "calfToThigh"),
+            )
+        }
+        limits = np.array(
+            [[data["limits"][key] for key in PROFILE_LIMITED_KEYS] for data in genders], dtype=np.float64
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Profile {profile_id} is incomplete or malformed: {e!r}") from e
+
+    expected_shapes = {
+        "chest_to_waist": (3, 2), "waist_to_hip": (3, 2), "shoulder_to_chest": (3, 2),
+        "thigh_to_hip": (3,), "upper_arm_to_chest": (3,), "forearm_to_chest": (3,), "calf_to_thigh": (3,),
+    }
+    for name, shape in expected_shapes.items():
+        if tables[name].shape != shape:
+            raise ValueError(f"Profile {profile_id}: {name} should have shape {shape}, got {tables[name].shape}")
+    if proportions.shape != (3, len(PROFILE_PROPORTION_KEYS), 2) or limits.shape != (3, len(PROFILE_LIMITED_KEYS), 2):
+        raise ValueError(f"Profile {profile_id}: proportions and limits must be [base, slope] and [min, max] pairs")
+    if np.any(limits[:, :, 0] > limits[:, :, 1]):
+        raise ValueError(f"Profile {profile_id}: a minimum limit is above its maximum")
+
+    base_proportions = np.ascontiguousarray(proportions[:, :, 0])
+    proportion_slopes = np.ascontiguousarray(proportions[:, :, 1])
+    digest = hashlib.blake2b(digest_size=6)
+    for array in (proportions, limits, *(tables[name] for name in sorted(tables))):
+        digest.update(array.tobytes())
+    return ProfileTables(
+        profile_id=profile_id,
+        version=str(document.get("version", "0")),
+        description=document.get("description", ""),
+        content_hash=digest.hexdigest(),
+        base_proportions=base_proportions,
+        proportion_slopes=proportion_slopes,
+        limits=limits,
+        base_proportion_rows=base_proportions.tolist(),
+        proportion_slope_rows=proportion_slopes.tolist(),
+        chest_to_waist_rows=tables["chest_to_waist"].tolist(),
+        waist_to_hip_rows=tables["waist_to_hip"].tolist(),
+        shoulder_to_chest_rows=tables["shoulder_to_chest"].tolist(),
+        thigh_to_hip_row=tables["thigh_to_hip"].tolist(),
+        upper_arm_to_chest_row=tables["upper_arm_to_chest"].tolist(),
+        forearm_to_chest_row=tables["forearm_to_chest"].tolist(),
+        calf_to_thigh_row=tables["calf_to_thigh"].tolist(),
+        limit_rows=limits.tolist(),
+        **tables,
+    )
+
+def load_profile(path: str) -> ProfileTables:
+    """Load a profile JSON file; the profile id is the file name without extension."""
+    with open(path, encoding="utf-8") as f:
+        document = json.load(f)
+    return build_profile(os.path.splitext(os.path.basename(path))[0], document)
+
+class ProfileRegistry:
+    """Profiles loaded from a directory of JSON files, reloaded when the files change.
+
+    Every process (including process executor workers) has its own registry and picks
+    up edited, added or removed files on its own, at most every reload_seconds.
+    A file that fails to load keeps the previously loaded version of that profile.
+    """
+
+    def __init__(self, directory: str, default_profile: str = "default", reload_seconds: float = 2):
+        self.directory = directory
+        self.default_profile = default_profile
+        self.reload_seconds = reload_seconds
+        self._profiles = {}
+        self._mtimes = {}
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def get(self, profile_id: str = None) -> ProfileTables:
+        """Return the tables of a profile, or of the default profile when profile_id is None."""
+        self._maybe_refresh()
+        profile_id = profile_id or self.default_profile
+        profile = self._profiles.get(profile_id)
+        if profile is None:
+            raise UnknownProfileError(f"Unknown profile {profile_id}, available: {', '.join(sorted(self._profiles))}")
+        return profile
+
+    def profiles(self) -> dict:
+        self._maybe_refresh()
+        return dict(self._profiles)
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        if self._checked_at is None or (self.reload_seconds and now - self._checked_at >= self.reload_seconds):
+            self.refresh()
+
+    def refresh(self, force: bool = False) -> dict:
+        """Load new or changed profile files and drop deleted ones; returns {profile id: version}."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            profiles = dict(self._profiles)
+            mtimes = {}
+            for name in sorted(os.listdir(self.directory)):
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(self.directory, name)
+                profile_id = name[:-len(".json")]
+                mtime = os.stat(path).st_mtime_ns
+                mtimes[profile_id] = mtime
+                if not force and self._mtimes.get(profile_id) == mtime:
+                    continue
+                try:
+                    profiles[profile_id] = load_profile(path)
+                    logger.info(f"Loaded profile {profiles[profile_id].tag}")
+                except (OSError, ValueError) as e:
+                    logger.error(f"Could not load profile {path}: {str(e)}")
+
+            for profile_id in set(profiles) - set(mtimes):
+                logger.info(f"Profile {profile_id} was removed")
+                del profiles[profile_id]
+            # Swap both at once so readers never see a half-updated registry
+            self._profiles, self._mtimes = profiles, mtimes
+            return {profile_id: profile.version for profile_id, profile in profiles.items()}
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry() -> ProfileRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ProfileRegistry(config.PROFILE_DIR, config.DEFAULT_PROFILE, config.PROFILE_RELOAD_SECONDS)
+    return _registry
+
+def get_profile(profile_id: str = None) -> ProfileTables:
+    """Tables of the given profile, or of the default one; raises UnknownProfileError."""
+    return get_registry().get(profile_id)
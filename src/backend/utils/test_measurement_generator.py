@@ -0,0 +1,63 @@
+
+"""Batch and scalar measurement generation must agree exactly for the same jitter draws.
+
+Deterministic mode (seeded jitter, ETags) and the result cache rely on this: a scan gets
+the same measurements whether it was generated alone or in a (micro-)batch.
+Run from src/backend with python -m pytest utils.
+"""
+
+import numpy as np
+
+from utils.measurement_generator import (
+    GENDER_CODES, MEASUREMENT_KEYS, generate_highly_accurate_measurements, generate_measurements_batch, seeded_rng,
+)
+
+def _people(count: int = 500, seed: int = 3):
+    draws = np.random.default_rng(seed)
+    genders = draws.choice(list(GENDER_CODES), count)
+    heights = np.round(draws.uniform(140, 205, count), 1)
+    has_side = draws.random(count) < 0.5
+    body_type_factors = draws.uniform(-0.5, 0.8, count)
+    waist_prominences = draws.choice([0.3, 0.5, 0.58, 0.62, 0.7], count)
+    return genders, heights, has_side, body_type_factors, waist_prominences
+
+def _scalar(genders, heights, has_side, body_type_factors, waist_prominences, rngs) -> list:
+    return [
+        generate_highly_accurate_measurements(
+            gender, float(height), bool(side), {"bodyTypeFactor": float(factor), "waistProminence": float(prominence)},
+            rng=rng,
+        )
+        for gender, height, side, factor, prominence, rng
+        in zip(genders, heights, has_side, body_type_factors, waist_prominences, rngs)
+    ]
+
+def _batch_rows(batch) -> list:
+    return [{key: float(row[key]) for key in MEASUREMENT_KEYS} for row in batch]
+
+def test_batch_matches_scalar_with_shared_generator():
+    genders, heights, has_side, factors, prominences = _people()
+    scalar_rng = np.random.default_rng(7)
+    scalar = _scalar(genders, heights, has_side, factors, prominences, [scalar_rng] * len(genders))
+    batch = generate_measurements_batch(
+        [GENDER_CODES[gender] for gender in genders], heights, has_side, factors, prominences,
+        rng=np.random.default_rng(7),
+    )
+    assert _batch_rows(batch) == scalar
+
+def test_batch_matches_scalar_with_seeded_rows():
+    genders, heights, has_side, factors, prominences = _people()
+    seeds = [f"scan-{i}" for i in range(len(genders))]
+    scalar = _scalar(genders, heights, has_side, factors, prominences, [seeded_rng(seed) for seed in seeds])
+    batch = generate_measurements_batch(
+        [GENDER_CODES[gender] for gender in genders], heights, has_side, factors, prominences,
+        rng=[seeded_rng(seed) for seed in seeds],
+    )
+    assert _batch_rows(batch) == scalar
+
+def test_seeded_generation_is_repeatable():
+    body_type_data = {"bodyTypeFactor": 0.2, "waistProminence": 0.6}
+    first = generate_highly_accurate_measurements("female", 168.0, True, body_type_data, rng=seeded_rng("scan", 1))
+    again = generate_highly_accurate_measurements("female", 168.0, True, body_type_data, rng=seeded_rng("scan", 1))
+    other = generate_highly_accurate_measurements("female", 168.0, True, body_type_data, rng=seeded_rng("scan", 2))
+    assert first == again
+    assert first != other